@@ -0,0 +1,171 @@
+#!/usr/bin/env python2.7
+
+import numpy
+from reduce_bridges import *
+
+class ArrayCrossing(Crossing):
+    """
+    A Crossing whose PD code and bridge are stored in a row of the arrays
+    of an ArrayKnot.
+    """
+    def __init__(self, knot, slot):
+        self.knot = knot
+        self.slot = slot
+
+    @property
+    def pd_code(self):
+        return self.knot.rows()[self.slot]
+
+    @pd_code.setter
+    def pd_code(self, pd_code):
+        self.knot.pd[self.slot] = pd_code
+        self.knot.cached_rows = None
+
+    @property
+    def bridge(self):
+        bridge = self.knot.bridge_ids[self.slot]
+        if bridge < 0:
+            return None
+        return int(bridge)
+
+    @bridge.setter
+    def bridge(self, bridge):
+        if bridge is None:
+            bridge = -1
+        self.knot.bridge_ids[self.slot] = bridge
+
+class ArrayKnot(Knot):
+    """
+    A Knot which stores its PD code as an (n,4) integer array and the bridge
+    of each crossing in a vector, so that relabeling every crossing is a
+    handful of array operations.
+
+    Each crossing owns a row (its slot) for as long as it is in the knot.
+    Rows of deleted crossings are reused by new crossings. Relabeling is
+    applied to every row, since the values in unused rows do not matter.
+
+    The PD codes are read far more often than they are written, so the rows
+    are converted to lists once after each change and shared by all reads.
+    """
+    def __init__(self, pd_code, name = None, bridges = None):
+        self.pd = numpy.array(pd_code, dtype = int).reshape(len(pd_code), 4)
+        self.bridge_ids = numpy.full(len(pd_code), -1, dtype = int)
+        self.free_slots = []
+        self.cached_rows = None
+        Knot.__init__(self, [ArrayCrossing(self, slot) for slot in range(len(pd_code))], name, bridges)
+
+    def alter_crossings_for_drag(self, ordered_segments, excluded):
+        """
+        Change the PD code values of the crossings not involved in a drag.
+
+        Arguments:
+        ordered_segments -- (list) The PD code values of the two segments we travel into, sorted.
+        excluded -- (list) The crossings involved in the drag.
+        """
+        kept = [(crossing.slot, self.pd[crossing.slot].copy()) for crossing in excluded]
+        self.pd = alter_array_for_drag(self.pd, ordered_segments[0], ordered_segments[1])
+        for slot, row in kept:
+            self.pd[slot] = row
+        self.cached_rows = None
+        self.segment_index = None
+        return self
+
+    def alter_crossings_greater_than(self, value, addend, maximum = None):
+        """
+        Change the value of all elements of all crossings which are greater
+        than the provided value.
+
+        Arguments:
+        value -- (int) The number to compare each element of the crossings with.
+        addend -- (int) The number to add to crossing elements greater than value.
+        maximum -- (int) The maximum allowed value of elements in the crossings.
+        """
+        self.pd = alter_array_if_greater(self.pd, value, addend, maximum)
+        self.cached_rows = None
+        self.segment_index = None
+        return self
+
+    def defer_drag_relabeling(self):
+        """
+        Relabeling every row takes a few array operations, so drags relabel
+        them right away.
+        """
+        return self
+
+    def delete_crossings(self, indices):
+        """
+        Delete crossings from a knot and free their rows.
+
+        Arguments:
+        indices -- (list) the indices of the crossings to delete
+        """
+        slots = [self.crossings[index].slot for index in indices]
+        Knot.delete_crossings(self, indices)
+        self.free_slots.extend(slots)
+        return self
+
+    def make_crossing(self, pd_code, bridge = None):
+        """
+        Return a new ArrayCrossing stored in a free row of this knot.
+
+        Arguments:
+        pd_code -- (list) the PD notation of the crossing
+        bridge -- (int) the key of the bridge the crossing belongs to or None
+        """
+        if not self.free_slots:
+            # Double the number of rows.
+            rows = max(len(self.pd), 1)
+            self.free_slots = range(len(self.pd) + rows - 1, len(self.pd) - 1, -1)
+            self.pd = numpy.vstack([self.pd, numpy.zeros((rows, 4), dtype = int)])
+            self.bridge_ids = numpy.concatenate([self.bridge_ids, numpy.full(rows, -1, dtype = int)])
+        crossing = ArrayCrossing(self, self.free_slots.pop())
+        crossing.pd_code = pd_code
+        crossing.bridge = bridge
+        return crossing
+
+    def rows(self):
+        """
+        Return the rows of the PD code array as a list of lists.
+        """
+        if self.cached_rows is None:
+            self.cached_rows = self.pd.tolist()
+        return self.cached_rows
+
+def alter_array_for_drag(pd, first, second):
+    """
+    The array version of alter_element_for_drag.
+
+    Arguments:
+    pd -- (array) The PD code values to alter.
+    first -- (int) The PD code value of the first segment we travel into.
+    second -- (int) The PD code value of the second segment we travel into.
+    """
+    return pd + 2*(pd > first) + 2*(pd > second)
+
+def alter_array_if_greater(pd, value, addend, maximum = None):
+    """
+    The array version of alter_if_greater.
+
+    Arguments:
+    pd -- (array) The PD code values to alter.
+    value -- (int) The number to compare each element with.
+    addend -- (int) The number to add to elements greater than value.
+    maximum -- (int) The maximum allowed value of the elements.
+    """
+    altered = pd + addend
+    if maximum:
+        altered[altered == 0] = maximum
+        wrapped = altered > maximum
+        altered[wrapped] %= maximum
+    return numpy.where(pd > value, altered, pd)
+
+def create_array_knot_from_pd_code(pd_code, name = None, bridges = None):
+    """
+    Create an ArrayKnot object using a provided PD code.
+
+    Arguments:
+    pd_code -- (list) the PD notation of a knot expressed as a list of lists
+    name -- (str) a string to identify the knot
+    bridges -- (list) Each element is a list of PD code values for the ends of each bridge
+    """
+    return ArrayKnot(pd_code, name, bridges)
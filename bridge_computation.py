@@ -4,7 +4,9 @@ import ast
 import csv
 import json
 import logging
-import sys, getopt, os
+import multiprocessing
+import sys, getopt, os, tempfile
+from bridge_search import *
 from reduce_bridges import *
 
 logging.basicConfig(filename='bridge_computation.log', filemode='w', format='%(asctime)s: %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p', level=logging.DEBUG)
@@ -12,19 +14,54 @@ logging.basicConfig(filename='bridge_computation.log', filemode='w', format='%(a
 def bridge_computation(argv):
     inputfile = ''
     outputdir = 'output'
+    dump_trees = False
+    jobs = 1
+    consolidated = None
+    search_options = {}
+    usage = 'bridge_computation.py -i <inputfile> -o <outputdir> -j <jobs> -t <tree_jobs> -c <consolidated_file> [--prune] [--prune-slack <slack>] [--target-bridges <k>] [--transpositions <size>] [--symmetry] [--backend <list|array|linked>] [--depth-first] [--dump-trees]'
     try:
-        opts, args = getopt.getopt(argv,"hi:o:",["inputfile=", "outputdir",])
+        opts, args = getopt.getopt(argv,"hi:o:j:t:c:",["inputfile=", "outputdir", "jobs=", "tree-jobs=", "consolidated=", "prune", "prune-slack=", "target-bridges=", "transpositions=", "symmetry", "backend=", "depth-first", "dump-trees"])
     except getopt.GetoptError:
-        print 'bridge_computation.py -i <inputfile> -o <outputdir>'
+        print usage
         sys.exit(2)
     for opt, arg in opts:
         if opt == '-h':
-            print 'bridge_computation.py -i <inputfile> -o <outputdir>'
+            print usage
             sys.exit()
         elif opt in ("-i", "--inputfile"):
             inputfile = arg
         elif opt in ("-o", "--outputdir"):
             outputdir = arg
+        elif opt in ("-j", "--jobs"):
+            jobs = int(arg)
+        elif opt in ("-t", "--tree-jobs"):
+            search_options['jobs'] = int(arg)
+        elif opt in ("-c", "--consolidated"):
+            consolidated = arg
+        elif opt == "--prune":
+            search_options['prune'] = True
+        elif opt == "--prune-slack":
+            search_options['prune_slack'] = int(arg)
+        elif opt == "--target-bridges":
+            search_options['target'] = int(arg)
+        elif opt == "--transpositions":
+            search_options['transpositions'] = int(arg)
+        elif opt == "--symmetry":
+            search_options['symmetry'] = True
+        elif opt == "--backend":
+            if arg not in KNOT_BACKENDS:
+                print usage
+                sys.exit(2)
+            search_options['backend'] = arg
+        elif opt == "--depth-first":
+            search_options['depth_first'] = True
+        elif opt == "--dump-trees":
+            dump_trees = True
+
+    if jobs > 1 and search_options.get('jobs', 1) > 1:
+        # Processes of a pool cannot start processes of their own.
+        print 'Use either -j to search several knots at once or -t to search the trees of one knot at once.'
+        sys.exit(2)
 
     # Create a directory for outputs.
     if not os.path.exists(outputdir):
@@ -32,56 +69,162 @@ def bridge_computation(argv):
 
     if os.path.isdir(inputfile):
         # Traverse the directory to process all csv files.
+        inputfiles = []
         for root, dirs, files in os.walk(inputfile):
             for file in files:
                 if file.endswith(".csv"):
-                    try:
-                        calculate_bridge_index(os.path.join(root, file), outputdir)
-                    except:
-                        logging.error('Failed to fully process ' + str(file))
-                        print 'Failed to fully process ' + str(file)
+                    inputfiles.append(os.path.join(root, file))
     elif os.path.isfile(inputfile):
-        calculate_bridge_index(inputfile, outputdir)
+        inputfiles = [inputfile]
     else:
         print "The specified input is not a file or a directory. Please try a different input."
         logging.warning("The specified input is not a file or a directory. Please try a different input.")
+        return
 
-def calculate_bridge_index(inputfile, outputdir):
-    # Read in a CSV.
-    with open(inputfile) as csvfile:
-        fieldnames = ['name', 'pd_notation']
-        knotreader = csv.DictReader(csvfile)
-        for row in knotreader:
-            # Create a file to store the output of all trees of this knot.
-            outfile_name = outputdir + '/' + row['name'] + '_output.csv'
-            with open(outfile_name, "w") as outfile:
-                outputwriter = csv.writer(outfile, delimiter=',')
-                outputwriter.writerow(['name','computed_bridge_index'])
+    if consolidated:
+        # Create the consolidated file with headers.
+        with open(consolidated, "w") as outfile:
+            outputwriter = csv.writer(outfile, delimiter=',')
+            outputwriter.writerow(['knot','name','computed_bridge_index'])
+
+    if jobs > 1:
+        calculate_bridge_indices_in_parallel(inputfiles, outputdir, jobs, dump_trees, consolidated, search_options)
+    else:
+        for file in inputfiles:
             try:
-                # Create a knot object.
-                knot = create_knot_from_pd_code(ast.literal_eval(row['pd_notation']), row['name'])
-                logging.info('Processing knot ' + str(knot.name))
-                logging.debug('The initial PD code of the knot is ' + str(knot))
-                # Simplify the knot now to avoid choosing bridges which will be
-                # discarded during simplification.
-                knot.simplify_rm1_rm2_recursively()
-                if knot.free_crossings != []:
-                    base_knot_name = row['name']
-                    directory = 'knot_trees/' + base_knot_name
-                    knot.list_bridge_ts(directory, 0)
-                    for subdir, dirs, files in os.walk(directory):
-                        more_to_process = True
-                        depth_to_process = 0
-                        while more_to_process == True:
-                            more_to_process = process_tree_with_depth(subdir, depth_to_process, outfile_name)
-                            depth_to_process += 1
-                        break
-                else:
-                    write_output(knot, outfile_name)
+                calculate_bridge_index(file, outputdir, dump_trees, consolidated, search_options)
             except:
-                print 'Failed to fully process the knot. Moving on to the next knot'
-                logging.warning('Failed to fully process ' + str(knot.name) + '. Moving on to the next knot.')
-                continue
+                logging.error('Failed to fully process ' + str(file))
+                print 'Failed to fully process ' + str(file)
+
+def calculate_bridge_index(inputfile, outputdir, dump_trees = False, consolidated = None, search_options = None):
+    """
+    Compute an upper bound on the bridge index of every knot in a CSV file.
+
+    Arguments:
+    inputfile -- (str) The path to a CSV file with the headers "name" and "pd_notation".
+    outputdir -- (str) The directory to store the output of each knot.
+    dump_trees -- (bool) Store every tree in knot_trees/ as CSV files while searching
+                  instead of keeping the search in memory. Useful for debugging.
+    consolidated -- (str) The path to a CSV file collecting the output of all knots.
+    search_options -- (dict) Keyword arguments for BridgeSearch.
+    """
+    for row in read_knots(inputfile):
+        name, rows = calculate_knot_bridge_index(row['name'], row['pd_notation'], outputdir, dump_trees, knot_search_options(row, search_options))
+        if consolidated:
+            write_consolidated_output(name, rows, consolidated)
+
+def calculate_bridge_indices_in_parallel(inputfiles, outputdir, jobs, dump_trees = False, consolidated = None, search_options = None):
+    """
+    Compute an upper bound on the bridge index of every knot in a list of
+    CSV files, spreading the knots across a pool of processes.
+
+    Each knot writes its own output file from the process that searched it.
+    Only the consolidated file is written by the parent process.
+
+    Arguments:
+    inputfiles -- (list) The paths to CSV files with the headers "name" and "pd_notation".
+    outputdir -- (str) The directory to store the output of each knot.
+    jobs -- (int) The number of processes to use.
+    dump_trees -- (bool) Store every tree in knot_trees/ as CSV files while searching.
+    consolidated -- (str) The path to a CSV file collecting the output of all knots.
+    search_options -- (dict) Keyword arguments for BridgeSearch.
+    """
+    tasks = []
+    for file in inputfiles:
+        try:
+            for row in read_knots(file):
+                tasks.append((row['name'], row['pd_notation'], outputdir, dump_trees, knot_search_options(row, search_options)))
+        except:
+            logging.error('Failed to fully process ' + str(file))
+            print 'Failed to fully process ' + str(file)
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for name, rows in pool.imap_unordered(calculate_knot_bridge_index_task, tasks):
+            if consolidated:
+                write_consolidated_output(name, rows, consolidated)
+    finally:
+        pool.close()
+        pool.join()
+
+def calculate_knot_bridge_index(name, pd_notation, outputdir, dump_trees = False, search_options = None):
+    """
+    Compute an upper bound on the bridge index of a single knot.
+
+    Return the name of the knot and the (name, computed_bridge_index) rows
+    written to its output file.
+
+    Arguments:
+    name -- (str) The name of the knot.
+    pd_notation -- (str) The PD code of the knot as it appears in the input CSV.
+    outputdir -- (str) The directory to store the output of the knot.
+    dump_trees -- (bool) Store every tree in knot_trees/ as CSV files while searching.
+    search_options -- (dict) Keyword arguments for BridgeSearch.
+    """
+    # Create a file to store the output of all trees of this knot.
+    outfile_name = outputdir + '/' + name + '_output.csv'
+    with open(outfile_name, "w") as outfile:
+        outputwriter = csv.writer(outfile, delimiter=',')
+        outputwriter.writerow(['name','computed_bridge_index'])
+    try:
+        # Create a knot object.
+        knot = create_knot_from_pd_code(ast.literal_eval(pd_notation), name)
+        logging.info('Processing knot ' + str(knot.name))
+        logging.debug('The initial PD code of the knot is ' + str(knot))
+        # Simplify the knot now to avoid choosing bridges which will be
+        # discarded during simplification.
+        knot.simplify_rm1_rm2_recursively()
+        if knot.has_free_crossings() and dump_trees:
+            # Give each knot its own scratch directory so that knots searched
+            # at the same time never share tree_i directories.
+            if not os.path.isdir('knot_trees'):
+                try:
+                    os.makedirs('knot_trees')
+                except OSError:
+                    pass
+            directory = tempfile.mkdtemp(prefix = name + '_', dir = 'knot_trees')
+            knot.list_bridge_ts(directory, 0)
+            for subdir, dirs, files in os.walk(directory):
+                more_to_process = True
+                depth_to_process = 0
+                while more_to_process == True:
+                    more_to_process = process_tree_with_depth(subdir, depth_to_process, outfile_name)
+                    depth_to_process += 1
+                break
+        elif knot.has_free_crossings():
+            BridgeSearch(knot, lambda leaf: write_output(leaf, outfile_name), **(search_options or {})).run()
+        else:
+            write_output(knot, outfile_name)
+    except:
+        print 'Failed to fully process the knot. Moving on to the next knot'
+        logging.warning('Failed to fully process ' + str(name) + '. Moving on to the next knot.')
+
+    with open(outfile_name) as outfile:
+        rows = [(row['name'], int(row['computed_bridge_index'])) for row in csv.DictReader(outfile)]
+    return name, rows
+
+def calculate_knot_bridge_index_task(args):
+    """
+    Unpack the arguments of calculate_knot_bridge_index for a process pool.
+    """
+    return calculate_knot_bridge_index(*args)
+
+def knot_search_options(row, search_options):
+    """
+    Return the options to search one knot with.
+
+    If the input CSV has a "bridge_index" column, a value in it is used as
+    the target of the search in place of --target-bridges.
+
+    Arguments:
+    row -- (dict) A row of an input CSV file.
+    search_options -- (dict) Keyword arguments for BridgeSearch shared by all knots.
+    """
+    options = dict(search_options or {})
+    if row.get('bridge_index'):
+        options['target'] = int(row['bridge_index'])
+    return options
 
 def process_tree_with_depth(directory, depth, outfile_name):
     more_to_process = False
@@ -94,15 +237,9 @@ def process_tree_with_depth(directory, depth, outfile_name):
                     treereader = csv.DictReader(treecsvfile)
                     for tree in treereader:
                         knot = create_knot_from_pd_code(ast.literal_eval(tree['pd_notation']), tree['name'], ast.literal_eval(tree['bridges']))
-                        while knot.free_crossings != []:
-                            try:
-                                # Drag underpasses & simplify until no moves are possible.
-                                args = knot.find_crossing_to_drag()
-                                knot.drag_crossing_under_bridge_resursively(*args)
-                                knot.simplify_rm1_rm2_recursively()
-                            except:
-                                break
-                        if knot.free_crossings == []:
+                        # Drag underpasses & simplify until no moves are possible.
+                        knot.drag_and_simplify_recursively()
+                        if not knot.has_free_crossings():
                             write_output(knot, outfile_name)
                         else:
                             knot.list_bridge_ts(subdir, depth + 1)
@@ -121,5 +258,29 @@ def write_output(knot, outfile_name):
     except IOError:
         sys.exit('Cannot write output file. Be sure the directory "outputs" exists and is writeable.')
 
+def read_knots(inputfile):
+    """
+    Return the rows of a CSV file with the headers "name" and "pd_notation".
+
+    Arguments:
+    inputfile -- (str) The path to the CSV file.
+    """
+    with open(inputfile) as csvfile:
+        return list(csv.DictReader(csvfile))
+
+def write_consolidated_output(knot_name, rows, consolidated):
+    """
+    Add the output of all trees of a knot to the consolidated file.
+
+    Arguments:
+    knot_name -- (str) The name of the knot.
+    rows -- (list) The (name, computed_bridge_index) of each tree of the knot.
+    consolidated -- (str) The path to the consolidated CSV file.
+    """
+    with open(consolidated, "a") as outfile:
+        outputwriter = csv.writer(outfile, delimiter=',')
+        for name, computed_bridge_index in rows:
+            outputwriter.writerow([knot_name, name, computed_bridge_index])
+
 if __name__ == "__main__":
     bridge_computation(sys.argv[1:])
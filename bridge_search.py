@@ -0,0 +1,402 @@
+#!/usr/bin/env python2.7
+
+import collections
+import logging
+import multiprocessing
+import Queue
+from array_knot import create_array_knot_from_pd_code
+from linked_knot import create_linked_knot_from_pd_code
+from reduce_bridges import *
+
+KNOT_BACKENDS = {
+    'list': create_knot_from_pd_code,
+    'array': create_array_knot_from_pd_code,
+    'linked': create_linked_knot_from_pd_code,
+}
+
+class BridgeSearch:
+    """
+    Search every tree of bridge choices of a knot while keeping the
+    frontier of (name, pd_code, bridges) states in memory.
+    """
+    def __init__(self, knot, write_leaf = None, jobs = 1, prune = False, prune_slack = 1, target = None, transpositions = 0, symmetry = False, backend = 'list', depth_first = False):
+        """
+        Arguments:
+        knot -- (obj) A simplified Knot with free crossings and no bridges
+        write_leaf -- (function) Called with each Knot that has no free crossings left
+        jobs -- (int) The number of processes sharing the trees of the knot
+        prune -- (bool) Skip states whose bridge count is at least prune_slack above the best
+                 bridge count found so far. This is a heuristic: a skipped state may still
+                 have led to a smaller count.
+        prune_slack -- (int) How far above the best bridge count a state may be before it is
+                       pruned. Bridges can merge or vanish during simplification, so no slack
+                       guarantees the minimum. A slack of 0 misses it for some non-minimal
+                       diagrams.
+        target -- (int) A lower bound on the bridge index, such as its known value. The search
+                  stops as soon as a leaf reaches it.
+        transpositions -- (int) The number of canonical states to remember so that a state
+                          reached along several branches is only expanded once. 0 turns
+                          the transposition table off.
+        symmetry -- (bool) Only search one tree for each orbit of pairs of crossings under
+                    the automorphisms of the diagram.
+        backend -- (str) The representation of the knots in the trees, a key of KNOT_BACKENDS.
+                   'array' stores each PD code in a NumPy array and relabels it in bulk.
+                   'linked' keeps the segments in order and labels them only when read.
+        depth_first -- (bool) Search each tree depth first, keeping only the knots on the path
+                       to the current state, instead of level by level. Only used with one job.
+        """
+        self.knot = knot
+        self.write_leaf = write_leaf
+        self.jobs = jobs
+        self.prune = prune
+        self.prune_slack = prune_slack
+        self.target = target
+        self.transpositions = transpositions
+        self.transposition_table = collections.OrderedDict()
+        self.transposition_hits = 0
+        self.symmetry = symmetry
+        self.backend = backend
+        self.create_knot = KNOT_BACKENDS[backend]
+        self.depth_first = depth_first
+        self.best = None
+        self.shared_best = None
+        self.greedy_leaf = None
+        self.pruned = 0
+        self.results = []
+
+    def best_bridge_count(self):
+        """
+        Return the smallest bridge count of any leaf found so far or None.
+        """
+        if self.shared_best is not None:
+            best = self.shared_best.value
+            if best >= 0:
+                return best
+            return None
+        return self.best
+
+    def descend_greedily(self):
+        """
+        Follow the first child of every state from the first root until
+        a leaf is reached and record it.
+
+        The full search skips the leaf when it reaches it again.
+        """
+        states = self.roots()
+        depth = 0
+        while states:
+            name, pd_code, bridges = states[0]
+            knot = self.create_knot(pd_code, name, bridges)
+            knot.drag_and_simplify_recursively()
+            if not knot.has_free_crossings():
+                logging.info('A greedy descent found ' + str(len(knot.bridges)) + ' bridges at ' + str(knot.name))
+                self.greedy_leaf = states[0]
+                self.record_leaf(knot)
+                return
+            depth += 1
+            states = knot.bridge_ts(depth)
+
+    def expand(self, state, depth):
+        """
+        Drag and simplify one state and return an iterator over the states
+        of its children.
+
+        Arguments:
+        state -- (tuple) The (name, pd_code, bridges) of the knot to expand
+        depth -- (int) The depth of the state in its tree
+        """
+        name, pd_code, bridges = state
+        if self.is_pruned(len(bridges)) or (state == self.greedy_leaf):
+            return []
+        if self.transpositions and self.is_transposition(pd_code, bridges):
+            return []
+        knot = self.create_knot(pd_code, name, bridges)
+        knot.drag_and_simplify_recursively()
+        if not knot.has_free_crossings():
+            self.record_leaf(knot)
+            return []
+        # Every child designates one more bridge.
+        if self.is_pruned(len(knot.bridges) + 1):
+            return []
+        return knot.iter_bridge_ts(depth + 1)
+
+    def expand_stolen_work(self, states, shared):
+        """
+        Expand states depth first, taking states from and donating states to
+        the other workers, until no state is left in any worker or one fails.
+
+        Arguments:
+        states -- (list) The (name, pd_code, bridges) states dealt to this worker
+        shared -- (dict) The queues and counters shared by all workers
+        """
+        local = collections.deque((state, 0) for state in states)
+        hungry = False
+        while True:
+            if self.is_finished() or shared['failed'].value:
+                # Donations left in the queue are no longer needed, so do not
+                # wait for them to be read before exiting.
+                shared['donations'].cancel_join_thread()
+                break
+            if not local:
+                if not hungry:
+                    hungry = True
+                    with shared['hungry'].get_lock():
+                        shared['hungry'].value += 1
+                try:
+                    local.extend(shared['donations'].get(timeout = 0.05))
+                except Queue.Empty:
+                    if shared['outstanding'].value == 0:
+                        break
+                    continue
+                # The donor has already taken this worker off the hungry count.
+                hungry = False
+                continue
+
+            state, depth = local.pop()
+            children = [(child, depth + 1) for child in self.expand(state, depth)]
+            local.extend(children)
+            with shared['outstanding'].get_lock():
+                shared['outstanding'].value += len(children) - 1
+
+            if shared['hungry'].value > 0 and len(local) > 1:
+                with shared['hungry'].get_lock():
+                    donate = shared['hungry'].value > 0
+                    if donate:
+                        shared['hungry'].value -= 1
+                if donate:
+                    donation = [local.popleft() for i in range(len(local)//2)]
+                    logging.debug('Donating ' + str(len(donation)) + ' states to a waiting worker')
+                    shared['donations'].put(donation)
+
+    def is_finished(self):
+        """
+        Determine if a leaf has reached the target bridge count, so no
+        other state can improve on it.
+        """
+        if self.target is None:
+            return False
+        best = self.best_bridge_count()
+        return (best is not None) and (best <= self.target)
+
+    def is_pruned(self, bridge_count):
+        """
+        Determine if a state with bridge_count bridges can no longer beat
+        the best bridge count found so far.
+
+        Arguments:
+        bridge_count -- (int) The number of bridges of the state
+        """
+        if not self.prune:
+            return False
+        best = self.best_bridge_count()
+        if (best is not None) and (bridge_count >= best + self.prune_slack):
+            self.pruned += 1
+            return True
+        return False
+
+    def is_transposition(self, pd_code, bridges):
+        """
+        Determine if a state has already been expanded, and remember it if not.
+
+        The table keeps the most recently seen states and forgets the least
+        recently seen once it holds more than self.transpositions of them.
+
+        Arguments:
+        pd_code -- (list) The PD code of the state
+        bridges -- (dict) The bridges of the state
+        """
+        key = canonical_state(pd_code, bridges)
+        if key in self.transposition_table:
+            self.transposition_hits += 1
+            # Move the state to the most recently seen end of the table.
+            self.transposition_table[key] = self.transposition_table.pop(key)
+            return True
+        self.transposition_table[key] = True
+        if len(self.transposition_table) > self.transpositions:
+            self.transposition_table.popitem(last = False)
+        return False
+
+    def log_statistics(self):
+        """
+        Log how many states the pruning and the transposition table skipped.
+        """
+        if self.prune:
+            logging.info('Pruned ' + str(self.pruned) + ' states of ' + str(self.knot.name))
+        if self.transpositions:
+            logging.info('Skipped ' + str(self.transposition_hits) + ' repeated states of ' + str(self.knot.name))
+
+    def record_leaf(self, knot):
+        """
+        Store the computed bridge index of a knot with no free crossings.
+
+        Arguments:
+        knot -- (obj) A Knot with no free crossings
+        """
+        self.results.append((knot.name, len(knot.bridges)))
+        self.update_best_bridge_count(len(knot.bridges))
+        if self.write_leaf:
+            self.write_leaf(knot)
+
+    def roots(self):
+        """
+        Return the states at the root of each tree of the knot.
+        """
+        if self.symmetry:
+            symmetries = self.knot.symmetries()
+            logging.info('The diagram of ' + str(self.knot.name) + ' has ' + str(len(symmetries)) + ' symmetries')
+            return self.knot.bridge_ts(0, symmetries)
+        return self.knot.bridge_ts(0)
+
+    def run(self):
+        """
+        Expand the trees level by level until every branch has ended.
+
+        Return a list of (name, computed_bridge_index) for each leaf.
+        """
+        if self.prune:
+            self.descend_greedily()
+        if self.is_finished():
+            frontier = []
+        elif self.jobs > 1:
+            return self.run_in_parallel()
+        elif self.depth_first:
+            return self.run_depth_first()
+        else:
+            frontier = self.roots()
+        depth = 0
+        while frontier:
+            logging.debug('Expanding ' + str(len(frontier)) + ' states at depth ' + str(depth))
+            next_frontier = []
+            for state in frontier:
+                next_frontier.extend(self.expand(state, depth))
+                if self.is_finished():
+                    logging.info('Reached the target of ' + str(self.target) + ' bridges. Skipping the remaining states of ' + str(self.knot.name))
+                    next_frontier = []
+                    break
+            frontier = next_frontier
+            depth += 1
+        self.log_statistics()
+        return self.results
+
+    def run_depth_first(self):
+        """
+        Expand the trees depth first, one state at a time.
+
+        The path from the roots to the current state is a stack of iterators
+        over the children of each state on it. Each iterator holds the knot of
+        its state and generates the next child from it when asked, so memory
+        grows with the depth of the trees rather than their width.
+
+        Return a list of (name, computed_bridge_index) for each leaf.
+        """
+        path = [iter(self.roots())]
+        while path:
+            state = next(path[-1], None)
+            if state is None:
+                path.pop()
+                continue
+            # The roots are at depth 0.
+            children = self.expand(state, len(path) - 1)
+            if self.is_finished():
+                logging.info('Reached the target of ' + str(self.target) + ' bridges. Skipping the remaining states of ' + str(self.knot.name))
+                break
+            if children:
+                path.append(iter(children))
+        self.log_statistics()
+        return self.results
+
+    def run_in_parallel(self):
+        """
+        Expand the trees with a pool of processes that steal work from each other.
+
+        The roots are dealt out to the workers, which expand their own states
+        depth first. Whenever a worker runs dry it waits on a shared queue, and
+        busy workers donate the oldest half of their states to it. The oldest
+        states are the shallowest, so a donation is usually a large subtree.
+
+        If a worker fails, the others are stopped and a RuntimeError is raised
+        once all of them have exited.
+
+        Return a list of (name, computed_bridge_index) for each leaf.
+        """
+        roots = self.roots()
+        shared = {
+            'donations': multiprocessing.Queue(),
+            'results': multiprocessing.Queue(),
+            'hungry': multiprocessing.Value('i', 0),
+            'outstanding': multiprocessing.Value('i', len(roots)),
+            'failed': multiprocessing.Value('i', 0),
+        }
+        # Workers share the best bridge count so that each prunes with the
+        # leaves found by all of them. -1 stands for no leaf yet.
+        self.shared_best = multiprocessing.Value('i', -1 if self.best is None else self.best)
+        workers = []
+        for i in range(self.jobs):
+            worker = multiprocessing.Process(target = self.steal_work, args = (roots[i::self.jobs], shared))
+            worker.start()
+            workers.append(worker)
+        # Collect the leaves of every worker before joining so no worker
+        # blocks on a full queue. A worker that is killed sends nothing, so
+        # check for exited workers while waiting.
+        errors = []
+        reports = 0
+        while reports < len(workers):
+            try:
+                results, error = shared['results'].get(timeout = 0.1)
+            except Queue.Empty:
+                dead = [worker for worker in workers if worker.exitcode not in (None, 0)]
+                if len(dead) + reports >= len(workers):
+                    errors.extend('a worker exited with code ' + str(worker.exitcode) for worker in dead)
+                    break
+                if dead:
+                    shared['failed'].value = 1
+                continue
+            reports += 1
+            self.results.extend(results)
+            if error:
+                errors.append(error)
+                shared['failed'].value = 1
+        for worker in workers:
+            worker.join()
+        self.best = self.best_bridge_count()
+        self.shared_best = None
+        if errors:
+            raise RuntimeError('The search of ' + str(self.knot.name) + ' failed: ' + '; '.join(errors))
+        return self.results
+
+    def steal_work(self, states, shared):
+        """
+        Expand states in a worker process until no state is left in any worker,
+        then send the leaves found and any error to the parent process.
+
+        Arguments:
+        states -- (list) The (name, pd_code, bridges) states dealt to this worker
+        shared -- (dict) The queues and counters shared by all workers
+        """
+        # The leaf of the greedy descent is already in the results of the
+        # parent process, so only send back the leaves found here.
+        self.results = []
+        try:
+            self.expand_stolen_work(states, shared)
+            error = None
+        except Exception as exception:
+            logging.exception('A worker failed while searching ' + str(self.knot.name))
+            error = repr(exception)
+            shared['failed'].value = 1
+            # The other workers stop as well, so donations may never be read.
+            shared['donations'].cancel_join_thread()
+        shared['results'].put((self.results, error))
+
+    def update_best_bridge_count(self, bridge_count):
+        """
+        Lower the best bridge count found so far to bridge_count if it is smaller.
+
+        Arguments:
+        bridge_count -- (int) The bridge count of a leaf
+        """
+        if self.shared_best is not None:
+            with self.shared_best.get_lock():
+                if (self.shared_best.value < 0) or (bridge_count < self.shared_best.value):
+                    self.shared_best.value = bridge_count
+        elif (self.best is None) or (bridge_count < self.best):
+            self.best = bridge_count
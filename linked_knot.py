@@ -0,0 +1,219 @@
+#!/usr/bin/env python2.7
+
+import itertools
+from reduce_bridges import *
+
+class LinkedCrossing(Crossing):
+    """
+    A Crossing which refers to the segments of a LinkedKnot by their ids,
+    which never change, rather than by their labels.
+
+    The labels of a crossing are looked up when its PD code is first read
+    and kept as an ordinary attribute, so reading them again costs no more
+    than for a Crossing, until the segments of the knot change.
+    """
+    def __init__(self, knot, segments, bridge = None):
+        # Set the attributes directly to skip __setattr__.
+        self.__dict__.update(knot = knot, segments = segments, bridge = bridge)
+
+    def __getattr__(self, name):
+        # Only called when the PD code is not cached.
+        if name != 'pd_code':
+            raise AttributeError(name)
+        knot = self.knot
+        labels = knot.segment_labels
+        if labels is None:
+            labels = knot.label_segments()
+        segments = self.segments
+        try:
+            pd_code = [labels[segment] for segment in segments]
+        except KeyError:
+            # Some of the segments have been merged since they were last read.
+            knot.resolve_merged_segments(segments)
+            pd_code = [labels[segment] for segment in segments]
+        self.__dict__['pd_code'] = pd_code
+        knot.labeled_crossings.append(self)
+        return pd_code
+
+    def __setattr__(self, name, value):
+        if name == 'pd_code':
+            self.__dict__['segments'] = self.knot.segments_labeled(value)
+            if 'pd_code' not in self.__dict__:
+                self.knot.labeled_crossings.append(self)
+        self.__dict__[name] = value
+
+class LinkedKnot(Knot):
+    """
+    A Knot which keeps the ids of its segments in the order they are
+    traveled, so that the label of a segment is its position in that order.
+    Position 0 holds a segment which no crossing uses unless alter_if_greater
+    wraps a label around to 0.
+
+    Dragging a crossing inserts segments and a Reidemeister move merges
+    segments, and every other crossing keeps its label through the change
+    of position of its segments. No crossing is relabeled by a move; a move
+    only forgets the labels, and they are recomputed at once the next time
+    a PD code is read.
+
+    Segments merged into another by a move keep their ids, which are
+    labeled with the segment they were merged into. The merges form a
+    union-find forest, so a merge costs O(1) and crossings resolve their
+    merged ids when they next read their labels.
+    """
+    def __init__(self, pd_code, name = None, bridges = None):
+        self.segments = range(2*len(pd_code) + 1)
+        self.next_segment_id = len(self.segments)
+        self.merged_segments = {}
+        self.segment_labels = None
+        self.labeled_crossings = []
+        Knot.__init__(self, [LinkedCrossing(self, list(crossing)) for crossing in pd_code], name, bridges)
+
+    def alter_crossings_for_drag(self, ordered_segments, excluded):
+        """
+        Insert the segments created by a drag after the two segments we
+        travel into. The crossings involved in the drag are given new PD
+        codes afterwards, so they need no special treatment.
+
+        Arguments:
+        ordered_segments -- (list) The PD code values of the two segments we travel into, sorted.
+        excluded -- (list) The crossings involved in the drag.
+        """
+        # Insert after the later segment first so that the earlier one keeps its position.
+        for label in reversed(ordered_segments):
+            self.segments[label+1:label+1] = [self.new_segment_id(), self.new_segment_id()]
+        return self.forget_labels()
+
+    def alter_crossings_greater_than(self, value, addend, maximum = None):
+        """
+        Change the positions of segments as alter_if_greater changes their
+        labels. A negative addend merges each segment after value into the
+        segment whose label it takes, and so does wrapping past maximum.
+
+        Arguments:
+        value -- (int) The label of the last segment that keeps its position.
+        addend -- (int) The number of positions to move the segments after value by.
+        maximum -- (int) The number of segments after the change.
+        """
+        segments = self.segments
+        if addend > 0:
+            segments[value+1:value+1] = [self.new_segment_id() for i in range(addend)]
+        elif addend < 0:
+            removed = segments[value+1:value+1-addend]
+            for label, segment in enumerate(removed, value + 1):
+                # A label of 0 becomes maximum, the last label left.
+                self.merge_segment(segment, segments[(label + addend) or -1])
+            del segments[value+1:value+1-addend]
+        if maximum and (len(segments) > maximum + 1):
+            for label, segment in enumerate(segments[maximum+1:], maximum + 1):
+                self.merge_segment(segment, segments[label%maximum])
+            del segments[maximum+1:]
+        return self.forget_labels()
+
+    def defer_drag_relabeling(self):
+        """
+        A drag relabels no crossing, so there is nothing to defer.
+        """
+        return self
+
+    def forget_labels(self):
+        """
+        Discard the labels of the segments after their order has changed.
+
+        Only the crossings whose PD codes have been read or set since the
+        labels were last forgotten have any to discard, so the cost is paid
+        by those reads rather than by every crossing.
+        """
+        self.segment_labels = None
+        self.segment_index = None
+        for crossing in self.labeled_crossings:
+            crossing.__dict__.pop('pd_code', None)
+        self.labeled_crossings = []
+        return self
+
+    def kept_segment(self, segment):
+        """
+        Return the id of the segment which a segment has been merged into,
+        or the segment itself if it has not been merged.
+
+        Arguments:
+        segment -- (int) The id of a segment
+        """
+        merged_segments = self.merged_segments
+        kept = segment
+        while kept in merged_segments:
+            kept = merged_segments[kept]
+        # Compress the path so that later lookups take one step.
+        while segment != kept:
+            merged_segments[segment], segment = kept, merged_segments[segment]
+        return kept
+
+    def label_segments(self):
+        """
+        Return a dictionary mapping the id of each segment in self.segments
+        to its label.
+        """
+        labels = dict(itertools.izip(self.segments, itertools.count()))
+        self.segment_labels = labels
+        return labels
+
+    def make_crossing(self, pd_code, bridge = None):
+        """
+        Return a new LinkedCrossing on the segments with the given labels.
+
+        Arguments:
+        pd_code -- (list) the PD notation of the crossing
+        bridge -- (int) the key of the bridge the crossing belongs to or None
+        """
+        return LinkedCrossing(self, self.segments_labeled(pd_code), bridge)
+
+    def merge_segment(self, merged, segment):
+        """
+        Label a segment that is about to be removed with another segment.
+
+        Arguments:
+        merged -- (int) The id of the segment to remove
+        segment -- (int) The id of the segment it becomes part of
+        """
+        segment = self.kept_segment(segment)
+        # A segment merged into itself would make kept_segment loop forever.
+        if segment != merged:
+            self.merged_segments[merged] = segment
+
+    def new_segment_id(self):
+        """
+        Return an id that no segment of the knot has had.
+        """
+        self.next_segment_id += 1
+        return self.next_segment_id - 1
+
+    def resolve_merged_segments(self, segments):
+        """
+        Replace the merged segments in a list by the segments they were
+        merged into.
+
+        Arguments:
+        segments -- (list) The ids of segments, such as those of a crossing
+        """
+        labels = self.segment_labels
+        segments[:] = [segment if segment in labels else self.kept_segment(segment) for segment in segments]
+        return segments
+
+    def segments_labeled(self, pd_code):
+        """
+        Return the ids of the segments with the labels in a PD code.
+
+        Arguments:
+        pd_code -- (list) PD code values of segments of the knot
+        """
+        return [self.segments[x] for x in pd_code]
+
+def create_linked_knot_from_pd_code(pd_code, name = None, bridges = None):
+    """
+    Create a LinkedKnot object using a provided PD code.
+
+    Arguments:
+    pd_code -- (list) the PD notation of a knot expressed as a list of lists
+    name -- (str) a string to identify the knot
+    bridges -- (list) Each element is a list of PD code values for the ends of each bridge
+    """
+    return LinkedKnot(pd_code, name, bridges)
@@ -1,12 +1,37 @@
 #!/usr/bin/env python2.7
 
+import bisect
 import itertools
 from itertools import repeat
 import logging
 import numpy
-import sys, os, csv, copy
-
-class Crossing:
+import sys, os, csv
+
+# The pairs of PD code positions of a crossing and the next crossing which
+# share segments when they form an RM2 move. The first set applies when the
+# first values of the crossings differ by 1, the second when they wrap around.
+RM2_INDICES_TO_COMPARE = [
+    [[[2,3],[0,3]],[[1,2],[1,0]]],
+    [[[0,3],[2,3]],[[0,1],[2,1]]],
+]
+
+# How to relabel the crossings of a drag, for each way the crossing to drag,
+# (a,b,c,d), meets the bridge crossing, (e,f,g,h), as returned by
+# drag_contact. Each entry holds
+#   - the position in (a,b,c,d,e,f,g,h) of the segment counted from for
+#     the overpass of the dragged crossing, and the offsets of its two labels,
+#   - the offsets from y of the overpasses of the two new crossings when y
+#     is f and a < y (they are swapped when y is h and lowered by 2 when a > y),
+#   - the position of the segment counted from for the underpass of the
+#     bridge crossing, and the offsets of its two labels.
+DRAG_CASES = {
+    'd=e': (1, [1,2], [[4,5],[3,2]], 1, [0,1]),
+    'b=e': (3, [2,1], [[2,3],[5,4]], 3, [0,1]),
+    'd=g': (4, [1,0], [[3,2],[4,5]], 4, [1,2]),
+    'b=g': (4, [0,1], [[5,4],[2,3]], 4, [1,2]),
+}
+
+class Crossing(object):
     def __init__(self, pd_code, bridge = None):
         self.pd_code = pd_code
         self.bridge = bridge
@@ -41,6 +66,8 @@ class Crossing:
         """
         Determine if there are duplicate values in the PD notation of a crossing.
         """
+        if len(set(self.pd_code)) == 4:
+            return False
         sets = reduce(
             lambda (u, d), o : (u.union([o]), d.union(u.intersection([o]))),
             self.pd_code,
@@ -60,16 +87,55 @@ class Crossing:
         else:
             return max(f, h)
 
-class Knot:
+class Knot(object):
     def __init__(self, crossings, name = None, bridges = None):
         self.name = name
         self.crossings = crossings # crossings is a list of Crossing objects
-        self.free_crossings = crossings[:]
+        # A crossing is free if its bridge is None. free_crossings and
+        # bridge_crossings list them in the order of self.crossings, while
+        # bridge_members holds the crossings of each bridge and free_count
+        # the number of free crossings, so that neither needs a scan. Set
+        # the bridge of a crossing with assign_bridge to keep them current.
         self.bridges = {}
+        self.bridge_members = {}
+        self.free_count = 0
+        for crossing in crossings:
+            if crossing.bridge is None:
+                self.free_count += 1
+            else:
+                self.bridge_members.setdefault(crossing.bridge, []).append(crossing)
+        # Maps each segment to the crossings containing it. Built on demand
+        # and discarded whenever the PD code changes.
+        self.segment_index = None
+        # Maps the id of each crossing to its index in self.crossings. Built
+        # on demand, shifted when a drag inserts crossings and discarded
+        # when crossings are deleted.
+        self.crossing_positions = None
+        # Crossings touched by a move since RM1 and RM2 moves were last
+        # looked for, and the crossings whose segments allow such moves.
+        # Relabeling keeps which segments crossings share, so only the
+        # crossings on the worklist need to be checked again.
+        self.rm_worklist = crossings[:]
+        self.twisted_crossings = []
+        self.rm2_candidates = []
+        # While a crossing is dragged under several bridges, the crossings
+        # not involved in any of the drags yet keep their labels, and the
+        # labels the drags inserted after are kept here instead. See
+        # defer_drag_relabeling.
+        self.drag_thresholds = None
+        self.relabeled_crossings = None
+        # What find_crossing_to_drag found by following each end of each
+        # bridge, keyed by (bridge key, end position), and the keys of the
+        # ends that examined each crossing. Crossings touched by a move or
+        # a change of bridge are put on stem_worklist, and the ends that
+        # examined them are followed again.
+        self.t_stems = {}
+        self.t_stem_keys = {}
+        self.stem_worklist = []
         if bridges:
             for bridge in bridges.itervalues():
                 bridge_end = bridge[0]
-                for free_crossing in self.free_crossings:
+                for free_crossing in self.free_crossings_with_segment(bridge_end):
                     count = free_crossing.pd_code.count(bridge_end)
                     if count == 1:
                         i = free_crossing.pd_code.index(bridge_end)
@@ -102,14 +168,212 @@ class Knot:
                 self.bridges[bridge_index][x_index] = alter_if_greater(x, value, addend, maximum)
         return self
 
+    def alter_crossings_for_drag(self, ordered_segments, excluded):
+        """
+        Change the PD code values of the crossings not involved in a drag.
+
+        Arguments:
+        ordered_segments -- (list) The PD code values of the two segments we travel into, sorted.
+        excluded -- (list) The crossings involved in the drag.
+        """
+        if self.drag_thresholds is not None:
+            # Only relabel the crossings which have current labels, and
+            # remember where the drag inserted segments for the others.
+            excluded = set(id(crossing) for crossing in excluded)
+            for key, crossing in self.relabeled_crossings.iteritems():
+                if key not in excluded:
+                    crossing.alter_for_drag(ordered_segments)
+            # Both segments are labeled before this drag, so convert both
+            # before inserting either.
+            thresholds = [label_before_drags(self.drag_thresholds, segment) for segment in ordered_segments]
+            for threshold in thresholds:
+                bisect.insort(self.drag_thresholds, threshold)
+            return self
+        for crossing in diff(self.crossings, excluded):
+            crossing.alter_for_drag(ordered_segments)
+        self.segment_index = None
+        return self
+
+    def alter_crossings_greater_than(self, value, addend, maximum = None):
+        """
+        Change the value of all elements of all crossings which are greater
+        than the provided value.
+
+        Arguments:
+        value -- (int) The number to compare each element of the crossings with.
+        addend -- (int) The number to add to crossing elements greater than value.
+        maximum -- (int) The maximum allowed value of elements in the crossings.
+        """
+        for crossing in self.crossings:
+            crossing.alter_elements_greater_than(value, addend, maximum)
+        self.segment_index = None
+        return self
+
+    def apply_deferred_drag_relabeling(self):
+        """
+        Relabel the crossings left behind by defer_drag_relabeling in one pass.
+        """
+        thresholds = self.drag_thresholds
+        if thresholds is None:
+            return self
+        if thresholds:
+            relabeled = self.relabeled_crossings
+            for crossing in self.crossings:
+                if id(crossing) not in relabeled:
+                    crossing.pd_code = [x + 2*bisect.bisect_left(thresholds, x) for x in crossing.pd_code]
+        self.drag_thresholds = None
+        self.relabeled_crossings = None
+        self.segment_index = None
+        return self
+
+    def assign_bridge(self, crossing, bridge_key):
+        """
+        Make a free crossing part of a bridge.
+
+        Arguments:
+        crossing -- (obj) A free Crossing of this knot
+        bridge_key -- (int) The key of the bridge in self.bridges
+        """
+        crossing.bridge = bridge_key
+        self.bridge_members.setdefault(bridge_key, []).append(crossing)
+        self.free_count -= 1
+        self.stem_worklist.append(crossing)
+        return self
+
     def bridge_crossings(self):
-        return diff(self.crossings, self.free_crossings)
+        """
+        Return the crossings that belong to a bridge in the order of self.crossings.
+
+        This scans every crossing, so it is only called once for each set
+        of bridge choices rather than inside loops.
+        """
+        return [crossing for crossing in self.crossings if crossing.bridge is not None]
+
+    def bridge_ts(self, depth = 0, symmetries = None):
+        """
+        Return the states formed by each bridge choice that forms a "T".
+
+        Each state is a tuple (name, pd_code, bridges) which can be passed to
+        create_knot_from_pd_code to rebuild the knot it describes.
+
+        Arguments:
+        depth -- (int) The depth of the tree, used to name the roots of new trees
+        symmetries -- (list) Automorphisms of the knot from Knot.symmetries. If given, only
+                      the first pair of crossings of each orbit becomes the root of a tree.
+        """
+        return list(self.iter_bridge_ts(depth, symmetries))
+
+    def canonical_key(self):
+        """
+        Return an encoding of the PD code and bridges of the knot which does
+        not depend on where the segment labels start or how bridges are keyed.
+        """
+        return canonical_state(self.pd_code(), self.bridges)
+
+    def check_rm_worklist(self):
+        """
+        Update the crossings which allow RM1 and RM2 moves from the
+        crossings touched by moves since the last check.
+        """
+        if not self.rm_worklist:
+            return self
+        num_crossings = len(self.crossings)
+        positions = self.crossing_positions
+        if positions is None:
+            positions = self.index_crossings()
+        touched = set()
+        pairs = set()
+        for crossing in self.rm_worklist:
+            index = positions.get(id(crossing))
+            if (index is None) or (index in touched):
+                # The crossing has been deleted or checked already.
+                continue
+            touched.add(index)
+            update_membership(self.twisted_crossings, crossing, crossing.has_duplicate_value())
+            # A crossing can form an RM2 move with the crossing before or after it.
+            pairs.update([(index-1)%num_crossings, index])
+        for index in pairs:
+            first = self.crossings[index]
+            second = self.crossings[(index+1)%num_crossings]
+            update_membership(self.rm2_candidates, first, has_rm2_pattern(first, second))
+        self.rm_worklist = []
+        return self
+
+    def crossing_index(self, crossing):
+        """
+        Return the index of a crossing object in self.crossings, or None
+        if it has been deleted.
+
+        The indices are kept until crossings are deleted.
+
+        Arguments:
+        crossing -- (obj) A Crossing of this knot
+        """
+        positions = self.crossing_positions
+        if positions is None:
+            positions = self.index_crossings()
+        return positions.get(id(crossing))
+
+    def crossings_with_segment(self, segment):
+        """
+        Return the crossings containing a segment in the order of self.crossings.
+
+        Arguments:
+        segment -- (int) The PD code value of the segment
+        """
+        if self.segment_index is None:
+            self.index_segments()
+        if self.drag_thresholds is not None:
+            return self.crossings_with_segment_during_drags(segment)
+        return self.segment_index.get(segment, [])
+
+    def crossings_with_segment_during_drags(self, segment):
+        """
+        Return the crossings containing a segment while drags are deferred,
+        relabeling those which do not have current labels yet.
+
+        Arguments:
+        segment -- (int) The current PD code value of the segment
+        """
+        thresholds = self.drag_thresholds
+        relabeled = self.relabeled_crossings
+        crossings = [crossing for crossing in relabeled.itervalues() if segment in crossing.pd_code]
+        # The segment index still holds the labels from before the drags.
+        label = label_before_drags(thresholds, segment)
+        if label + 2*bisect.bisect_left(thresholds, label) == segment:
+            for crossing in self.segment_index.get(label, []):
+                if id(crossing) not in relabeled:
+                    crossing.pd_code = [x + 2*bisect.bisect_left(thresholds, x) for x in crossing.pd_code]
+                    relabeled[id(crossing)] = crossing
+                    crossings.append(crossing)
+        if len(crossings) > 1:
+            crossings.sort(key = self.crossing_index)
+        return crossings
+
+    def defer_drag_relabeling(self):
+        """
+        Start dragging crossings without relabeling the crossings which are
+        not involved in the drags.
+
+        Crossings are relabeled once they are looked up by segment, and all
+        others at once by apply_deferred_drag_relabeling, instead of every
+        crossing in every drag. Only crossings returned by
+        crossings_with_segment may be read until then.
+        """
+        if self.segment_index is None:
+            self.index_segments()
+        self.drag_thresholds = []
+        self.relabeled_crossings = {}
+        return self
 
     def delete_bridge(self, bridge_key):
-        for crossing in self.bridge_crossings():
-            if (crossing.bridge == bridge_key):
-                crossing.bridge = None
-                self.free_crossings.append(crossing)
+        crossings = self.bridge_members.pop(bridge_key, [])
+        for crossing in crossings:
+            crossing.bridge = None
+        self.free_count += len(crossings)
+        self.stem_worklist.extend(crossings)
+        self.t_stems.pop((bridge_key, 0), None)
+        self.t_stems.pop((bridge_key, 1), None)
         del(self.bridges[bridge_key])
         logging.debug('The bridge with key ' + str(bridge_key) + ' has been deleted.')
         return self
@@ -117,7 +381,6 @@ class Knot:
     def delete_crossings(self, indices):
         """
         Delete crossings from a knot.
-        This removes objects from both knot.crossings and knot.free_crossings.
 
         Arguments:
         indices -- (list) the indices of the crossings to delete
@@ -125,9 +388,26 @@ class Knot:
         # Delete crossings from last to first to avoid changing
         # the index of crossings not yet processed.
         indices.sort(reverse = True)
+        # Segments of deleted crossings merge, and their neighbors in the
+        # list become adjacent, so those crossings must be checked again.
+        num_crossings = len(self.crossings)
+        for index in indices:
+            crossing = self.crossings[index]
+            for segment in set(crossing.pd_code):
+                self.rm_worklist.extend(self.crossings_with_segment(segment))
+                self.stem_worklist.extend(self.crossings_with_segment(segment))
+            self.rm_worklist.append(self.crossings[index-1])
+            self.rm_worklist.append(self.crossings[(index+1)%num_crossings])
+            update_membership(self.twisted_crossings, crossing, False)
+            update_membership(self.rm2_candidates, crossing, False)
+            if crossing.bridge is None:
+                self.free_count -= 1
+            else:
+                update_membership(self.bridge_members[crossing.bridge], crossing, False)
         for index in indices:
             del self.crossings[index]
-        self.free_crossings = list(set(self.crossings).intersection(self.free_crossings))
+        self.segment_index = None
+        self.crossing_positions = None
         return self
 
     def designate_additional_bridge(self):
@@ -139,10 +419,17 @@ class Knot:
         all_bridge_segments = [crossing.pd_code[i] for crossing in bridge_crossings for i in [0, 2]]
         bridge_interior_segments = diff(all_bridge_segments, bridge_ends)
 
+        # Free crossings passing over the interior of a bridge or touching a bridge end.
+        candidates = set()
+        for segment in bridge_interior_segments:
+            for crossing in self.crossings_with_segment(segment):
+                if segment in [crossing.pd_code[1], crossing.pd_code[3]]:
+                    candidates.add(id(crossing))
+        for end in bridge_ends:
+            candidates.update(id(crossing) for crossing in self.crossings_with_segment(end))
+
         for free_crossing in self.free_crossings:
-            interior_match = list(set([free_crossing.pd_code[1], free_crossing.pd_code[3]]) & set(bridge_interior_segments))
-            end_match = list(set(bridge_ends) & set(free_crossing.pd_code))
-            if (interior_match or end_match):
+            if id(free_crossing) in candidates:
                 self.designate_bridge(free_crossing)
                 return self
 
@@ -164,11 +451,24 @@ class Knot:
           key = 0
         # Designate the bridge and update the crossing's info.
         self.bridges[key] = [crossing.pd_code[1], crossing.pd_code[3]]
-        self.free_crossings.remove(crossing)
-        crossing.bridge = key
+        self.assign_bridge(crossing, key)
         logging.debug('Crossing ' + str(crossing.pd_code) + ' has been designated as a bridge with key ' + str(key))
-        self.extend_bridge(crossing.bridge)
-        
+        self.extend_bridge(key)
+        return key
+
+    def drag_and_simplify_recursively(self):
+        """
+        Drag underpasses and simplify until no more moves are possible.
+        """
+        while self.has_free_crossings():
+            try:
+                args = self.find_crossing_to_drag()
+                self.drag_crossing_under_bridge_resursively(*args)
+                self.simplify_rm1_rm2_recursively()
+            except:
+                break
+        return self
+
     def drag_crossing_under_bridge(self, crossing_to_drag, adjacent_segment):
         def find_bridge_to_go_under(adjacent_segment):
             """
@@ -177,8 +477,8 @@ class Knot:
             Arguments:
             adjacent_segment -- (int) The PD code value of the segment to drag a crossing along.
             """
-            for crossing in self.bridge_crossings():
-                if adjacent_segment in crossing.pd_code:
+            for crossing in self.crossings_with_segment(adjacent_segment):
+                if crossing.bridge is not None:
                     return crossing
 
         bridge_crossing = find_bridge_to_go_under(adjacent_segment)
@@ -193,122 +493,63 @@ class Knot:
 
         # Alter the PD codes of all crossings not invloved in the drag.
         a_y_sorted = sorted([a, y])
-        for crossing in diff(self.crossings, [crossing_to_drag, bridge_crossing]):
-            crossing.alter_for_drag(a_y_sorted)
-
-        # Replace the crossing being dragged, (a,b,c,d).
-        if d == e:
-            i = sorted([a, y, b]).index(b)
-            if a < y:
-                m, n, r, s, t, u, v, w = a, a+1, a+2, a+3, a+1, a+2, alter_if_greater(b+1+2*i, new_max_pd_val, 0, new_max_pd_val), alter_if_greater(b+2+2*i, new_max_pd_val, 0, new_max_pd_val)
-                if y == f:
-                    logging.debug('Dragging case d=e, a<y, y==f')
-                    y_vals_one = alter_y_values(y, [4,5], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [3,2], new_max_pd_val)
-                elif y == h:
-                    logging.debug('Dragging case d=e, a<y, y==h')
-                    y_vals_one = alter_y_values(y, [3,2], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [4,5], new_max_pd_val)
-            if a > y:
-                m, n, r, s, t, u, v, w = a+2, a+3, a+4, alter_if_greater(a+5, new_max_pd_val, 0, new_max_pd_val), a+3, a+4, alter_if_greater(b+1+2*i, new_max_pd_val, 0, new_max_pd_val), alter_if_greater(b+2+2*i, new_max_pd_val, 0, new_max_pd_val)
-                if y == f:
-                    logging.debug('Dragging case d=e, a>y, y==f')
-                    y_vals_one = alter_y_values(y, [2,3], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [1,0], new_max_pd_val)
-                elif y == h:
-                    logging.debug('Dragging case d=e, a>y, y==h')
-                    y_vals_one = alter_y_values(y, [1,0], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [2,3], new_max_pd_val)
-        elif b == e:
-            i = sorted([a,y,d]).index(d)
-            if a < y:
-                m, n, r, s, t, u, v, w = a, a+1, a+2, a+3, a+1, a+2, alter_if_greater(d+2+2*i, new_max_pd_val, 0, new_max_pd_val), alter_if_greater(d+1+2*i, new_max_pd_val, 0, new_max_pd_val)
-                if y == f:
-                    logging.debug('Dragging case b=e, a<y, y==f')
-                    y_vals_one = alter_y_values(y, [2,3], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [5,4], new_max_pd_val)
-                elif y == h:
-                    logging.debug('Dragging case b=e, a<y, y==h')
-                    y_vals_one = alter_y_values(y, [5,4], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [2,3], new_max_pd_val)
-            if a > y:
-                m, n, r, s, t, u, v, w = a+2, a+3, a+4, alter_if_greater(a+5, new_max_pd_val, 0, new_max_pd_val), a+3, a+4, alter_if_greater(d+2+2*i, new_max_pd_val, 0, new_max_pd_val), alter_if_greater(d+1+2*i, new_max_pd_val, 0, new_max_pd_val)
-                if y == f:
-                    logging.debug('Dragging case b=e, a>y, y==f')
-                    y_vals_one = alter_y_values(y, [0,1], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [3,2], new_max_pd_val)
-                elif y == h:
-                    logging.debug('Dragging case b=e, a>y, y==h')
-                    y_vals_one = alter_y_values(y, [3,2], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [0,1], new_max_pd_val)
-        elif d == g:
-            i = sorted([a,y,e]).index(e)
-            if a < y:
-                m, n, r, s, t, u, v, w = a, a+1, a+2, a+3, a+1, a+2, alter_if_greater(e+1+2*i, new_max_pd_val, 0, new_max_pd_val), e+2*i
-                if y == f:
-                    logging.debug('Dragging case d=g, a<y, y==f')
-                    y_vals_one = alter_y_values(y, [3,2], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [4,5], new_max_pd_val)
-                elif y == h:
-                    logging.debug('Dragging case d=g, a<y, y==h')
-                    y_vals_one = alter_y_values(y, [4,5], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [3,2], new_max_pd_val)
-            if a > y:
-                m, n, r, s, t, u, v, w = a+2, a+3, a+4, alter_if_greater(a+5, new_max_pd_val, 0, new_max_pd_val), a+3, a+4, alter_if_greater(e+1+2*i, new_max_pd_val, 0, new_max_pd_val), e+2*i
-                if y == f:
-                    logging.debug('Dragging case d=g, a>y, y==f')
-                    y_vals_one = alter_y_values(y, [1,0], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [2,3], new_max_pd_val)
-                elif y == h:
-                    logging.debug('Dragging case d=g, a>y, y==h')
-                    y_vals_one = alter_y_values(y, [2,3], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [1,0], new_max_pd_val)
-        elif b == g:
-            i = sorted([a,y,e]).index(e)
-            if a < y:
-                m, n, r, s, t, u, v, w = a, a+1, a+2, a+3, a+1, a+2, e+2*i, alter_if_greater(e+1+2*i, new_max_pd_val, 0, new_max_pd_val)
-                if y == f:
-                    logging.debug('Dragging case b=g, a<y, y==f')
-                    y_vals_one = alter_y_values(y, [5,4], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [2,3], new_max_pd_val)
-                elif y == h:
-                    logging.debug('Dragging case b=g, a<y, y==h')
-                    y_vals_one = alter_y_values(y, [2,3], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [5,4], new_max_pd_val)
-            if a > y:
-                m, n, r, s, t, u, v, w = a+2, a+3, a+4, alter_if_greater(a+5, new_max_pd_val, 0, new_max_pd_val), a+3, a+4, e+2*i, alter_if_greater(e+1+2*i, new_max_pd_val, 0, new_max_pd_val)
-                if y == f:
-                    logging.debug('Dragging case b=g, a>y, y==f')
-                    y_vals_one = alter_y_values(y, [3,2], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [0,1], new_max_pd_val)
-                elif y == h:
-                    logging.debug('Dragging case b=g, a>y, y==h')
-                    y_vals_one = alter_y_values(y, [0,1], new_max_pd_val)
-                    y_vals_two = alter_y_values(y, [3,2], new_max_pd_val)
-
-        crossing_one = Crossing([m, y_vals_one[0], n, y_vals_one[1]], bid)
-        crossing_two = Crossing([r, y_vals_two[0], s, y_vals_two[1]], bid)
-        crossing_to_drag.pd_code = [t, v, u, w]
-        index = self.crossings.index(crossing_to_drag)
+        self.alter_crossings_for_drag(a_y_sorted, [crossing_to_drag, bridge_crossing])
+
+        # Replace the crossing being dragged, (a,b,c,d), by the two new
+        # crossings and itself, as DRAG_CASES describes. Like the relabeling
+        # above, a drag which no case covers fails after it has begun.
+        if a == y:
+            raise ValueError('Cannot drag ' + str(crossing_to_drag.pd_code) + ' along the overpass it passes under')
+        contact = drag_contact(b, d, e, g)
+        if contact is None:
+            raise ValueError('Cannot drag ' + str(crossing_to_drag.pd_code) + ' under ' + str(bridge_crossing.pd_code) + ', which it does not meet')
+        pivot, overpass_offsets, y_offsets, bridge_pivot, bridge_offsets = DRAG_CASES[contact]
+        values = (a, b, c, d, e, f, g, h)
+        x = values[pivot]
+        i = sorted([a, y, x]).index(x)
+        # Labels after a are 2 larger if the segment inserted after y comes first.
+        shift = 0 if a < y else 2
+        m, n, r, s = [alter_if_greater(a+shift+k, new_max_pd_val, 0, new_max_pd_val) for k in range(4)]
+        v, w = [alter_if_greater(x+offset+2*i, new_max_pd_val, 0, new_max_pd_val) for offset in overpass_offsets]
+        if y == f:
+            y_offsets_one, y_offsets_two = y_offsets
+        else:
+            y_offsets_two, y_offsets_one = y_offsets
+        y_vals_one = alter_y_values(y, [offset-shift for offset in y_offsets_one], new_max_pd_val)
+        y_vals_two = alter_y_values(y, [offset-shift for offset in y_offsets_two], new_max_pd_val)
+        logging.debug('Dragging case ' + contact + ', ' + ('a<y' if a < y else 'a>y') + ', ' + ('y==f' if y == f else 'y==h'))
+
+        crossing_one = self.make_crossing([m, y_vals_one[0], n, y_vals_one[1]], bid)
+        crossing_two = self.make_crossing([r, y_vals_two[0], s, y_vals_two[1]], bid)
+        self.bridge_members[bid].extend([crossing_one, crossing_two])
+        crossing_to_drag.pd_code = [n, v, r, w]
+        index = self.crossing_index(crossing_to_drag)
         self.crossings[index:index+1] = crossing_one, crossing_to_drag, crossing_two
+        positions = self.crossing_positions
+        if positions is not None:
+            # Only the crossings from the dragged one on have moved.
+            crossings = self.crossings
+            for position in xrange(index, len(crossings)):
+                positions[id(crossings[position])] = position
         logging.debug('(a,b,c,d) becomes ' + str(crossing_one.pd_code) + str(crossing_to_drag.pd_code) + str(crossing_two.pd_code))
 
-        # Alter the PD code of the bridge crossing, (e,f,g,h).
-        if b == e:
-            m = alter_if_greater(d+2*i, new_max_pd_val, 0, new_max_pd_val)
-            n = alter_if_greater(d+1+2*i, new_max_pd_val, 0, new_max_pd_val)
-        if d == e:
-            m = alter_if_greater(b+2*i, new_max_pd_val, 0, new_max_pd_val)
-            n = alter_if_greater(b+1+2*i, new_max_pd_val, 0, new_max_pd_val)
-        elif (d == g) or (b == g):
-            m = alter_if_greater(e+1+2*i, new_max_pd_val, 0, new_max_pd_val)
-            n = alter_if_greater(e+2+2*i, new_max_pd_val, 0, new_max_pd_val)
+        # Alter the PD code of the bridge crossing, (e,f,g,h). When (a,b,c,d)
+        # also meets it at g, g decides which segment to count from.
+        if (d != e) and ((d == g) or (b == g)):
+            bridge_pivot, bridge_offsets = DRAG_CASES['d=g'][3:]
+        x = values[bridge_pivot]
+        m, n = [alter_if_greater(x+offset+2*i, new_max_pd_val, 0, new_max_pd_val) for offset in bridge_offsets]
         addends = get_y_addends(a, h, y)
         bridge_crossing.pd_code = [m, y+addends[0], n, y+addends[1]]
+        if self.drag_thresholds is not None:
+            for crossing in [crossing_one, crossing_to_drag, crossing_two, bridge_crossing]:
+                self.relabeled_crossings[id(crossing)] = crossing
+        else:
+            self.segment_index = None
+        self.rm_worklist.extend([crossing_one, crossing_to_drag, crossing_two, bridge_crossing])
+        self.stem_worklist.extend([crossing_to_drag, bridge_crossing])
         logging.debug('(e,f,g,h) becomes ' + str(bridge_crossing.pd_code))
 
-        logging.debug('PD code of the knot after dragging is ' + str(self))
-
         # Alter PD code values of bridge ends.
         for i, bridge in self.bridges.iteritems():
             self.bridges[i] = map(alter_element_for_drag, bridge, repeat(a_y_sorted[0],2), repeat(a_y_sorted[1],2))
@@ -331,17 +572,25 @@ class Knot:
         """
         Drag a crossing under multiple, consecutive bridges.
 
+        The crossings not involved in any of the drags are relabeled once
+        at the end rather than after every drag.
+
         Arguments:
         crossing_to_drag -- (obj) A Crossing to drag
         adjacent_segment -- (int) The PD code value of the adjacent segment to drag along
         drag_count -- (int) The number of bridges to drag the crossing underneath
         """
-        while (drag_count > 0):
-            crossing_to_drag, adjacent_segment = self.drag_crossing_under_bridge(crossing_to_drag, adjacent_segment)
-            drag_count -= 1
-            # Stop if the crossing being dragged has been assigned to a bridge.
-            if crossing_to_drag.bridge:
-                break;
+        self.defer_drag_relabeling()
+        try:
+            while (drag_count > 0):
+                crossing_to_drag, adjacent_segment = self.drag_crossing_under_bridge(crossing_to_drag, adjacent_segment)
+                drag_count -= 1
+                # Stop if the crossing being dragged has been assigned to a bridge.
+                if crossing_to_drag.bridge:
+                    break;
+        finally:
+            self.apply_deferred_drag_relabeling()
+        logging.debug('PD code of the knot after dragging is ' + str(self))
 
     def extend_bridge(self, bridge_index):
         """
@@ -352,25 +601,25 @@ class Knot:
         """
         bridge = self.bridges[bridge_index]
         logging.debug('We will try to extend the bridge ' + str(bridge))
+        self.t_stems.pop((bridge_index, 0), None)
+        self.t_stems.pop((bridge_index, 1), None)
         for x in bridge:
             index = bridge.index(x)
             x_is_deadend = False
             while (x_is_deadend == False):
-                result = filter(lambda free_crossing: x in free_crossing.pd_code, self.free_crossings)
+                result = self.free_crossings_with_segment(x)
                 if result:
                     crossing = result.pop()
                     if x == crossing.pd_code[1]:
                         logging.debug('Bridge end ' + str(x) + ' can be extended to ' + str(crossing.pd_code[3]))
                         bridge[index] = crossing.pd_code[3]
                         x = crossing.pd_code[3]
-                        self.free_crossings.remove(crossing)
-                        crossing.bridge = bridge_index
+                        self.assign_bridge(crossing, bridge_index)
                     elif x == crossing.pd_code[3]:
                         logging.debug('Bridge end ' + str(x) + ' can be extended to ' + str(crossing.pd_code[1]))
                         bridge[index] = crossing.pd_code[1]
                         x = crossing.pd_code[1]
-                        self.free_crossings.remove(crossing)
-                        crossing.bridge = bridge_index
+                        self.assign_bridge(crossing, bridge_index)
                     else:
                         logging.debug('Bridge end ' + str(x) + ' is a dead-end and cannot be extended')
                         x_is_deadend = True
@@ -378,76 +627,132 @@ class Knot:
                     break;
 
     def find_crossing_to_drag(self):
-        max_pd_code_value = self.max_pd_code_value()
-        for bridge in self.bridges.itervalues():
-            for end in bridge:
-                crossings_containing_end = []
-                for crossing in self.bridge_crossings():
-                    if end in crossing.pd_code:
-                        crossings_containing_end.append(crossing)
-                if len(crossings_containing_end) == 2:
-                    # end is a T stem.
-                    logging.debug(str(end) + ' is a T stem')
-
-                    # Get the value of the segment adjacent to end.
-                    for end_crossing in crossings_containing_end:
-                        i = end_crossing.pd_code.index(end)
-                        if (i%2 == 0):
-                            adjacent_segment = end_crossing.pd_code[(i+2)%4]
-                            logging.debug('The segment adjacent to the T stem is ' + str(adjacent_segment))
-                            # Determine the addend needed to calculate the next adjacent segment
-                            # based on the direction we travel along the T stem.
-                            if i == 0:
-                                next_segment_addend = 1
-                            else:
-                                next_segment_addend = -1
-                            logging.debug('The next_segment_addend is ' + str(next_segment_addend))
-                            break;
-
-                    drag_count = 0
-                    continue_search = True
-                    while continue_search:
-                        reached_deadend = False
-
-                        # Does adjacent_segment belong to a free crossing (deadend)?
-                        for free_crossing in self.free_crossings:
-                            if adjacent_segment in free_crossing.pd_code:
-                                reached_deadend = True
-                                break;
-
-                        if reached_deadend:
-                            if (free_crossing.pd_code.index(adjacent_segment)%2 == 1):
-                                # The crossing is oriented such that we can drag it.
-                                drag_count += 1
-                                logging.debug('Crossing ' + str(free_crossing.pd_code) + ' can be dragged along ' + str(adjacent_segment))
-                                return (free_crossing, adjacent_segment, drag_count)
-                            else:
-                                continue_search = False
-                                logging.debug('We have completed our search of this stem')
-                                break
-                        else:
-                            drag_count += 1
-                            # Consider the next crossing along the T stem.
-                            adjacent_segment = next_adjacent_segment(adjacent_segment, next_segment_addend, max_pd_code_value)
-                            logging.debug('We need to consider the next crossing along the T stem containing ' + str(adjacent_segment))
+        """
+        Return (crossing, adjacent_segment, drag_count) for the first free
+        crossing which can be dragged along a T stem, or False if there is
+        none.
+
+        Each end is only followed again once a crossing it examined has
+        been touched, so after a move most ends are looked up rather than
+        followed.
+        """
+        self.update_t_stems()
+        max_pd_code_value = None
+        for bridge_key, bridge in self.bridges.iteritems():
+            for position, end in enumerate(bridge):
+                key = (bridge_key, position)
+                t_stem = self.t_stems.get(key)
+                if t_stem is None:
+                    if max_pd_code_value is None:
+                        max_pd_code_value = self.max_pd_code_value()
+                    examined, t_stem = self.follow_t_stem(end, max_pd_code_value)
+                    self.t_stems[key] = t_stem
+                    for crossing in examined:
+                        self.t_stem_keys.setdefault(id(crossing), set()).add(key)
+                if t_stem:
+                    free_crossing, index, drag_count = t_stem
+                    return (free_crossing, free_crossing.pd_code[index], drag_count)
 
         # If we check all of the bridge Ts and cannot find a crossing to drag,
         # return False to signify we need to identify a new bridge.
         logging.debug('There are no crossings to drag. We need to identify another bridge.')
         return False
 
+    def follow_t_stem(self, end, max_pd_code_value):
+        """
+        Follow a bridge end along its T stem to the first free crossing.
+
+        Return the crossings examined on the way and either False, if end
+        is not a T stem or its free crossing cannot be dragged, or the
+        crossing with the index of the segment to drag it along and the
+        number of bridges to drag it under.
+
+        Arguments:
+        end -- (int) The PD code value of a bridge end
+        max_pd_code_value -- (int) The maximum PD code value for the knot diagram.
+        """
+        examined = list(self.crossings_with_segment(end))
+        crossings_containing_end = [crossing for crossing in examined if crossing.bridge is not None]
+        if len(crossings_containing_end) != 2:
+            return examined, False
+        # end is a T stem.
+        logging.debug(str(end) + ' is a T stem')
+
+        # Get the value of the segment adjacent to end.
+        for end_crossing in crossings_containing_end:
+            i = end_crossing.pd_code.index(end)
+            if (i%2 == 0):
+                adjacent_segment = end_crossing.pd_code[(i+2)%4]
+                logging.debug('The segment adjacent to the T stem is ' + str(adjacent_segment))
+                # Determine the addend needed to calculate the next adjacent segment
+                # based on the direction we travel along the T stem.
+                if i == 0:
+                    next_segment_addend = 1
+                else:
+                    next_segment_addend = -1
+                logging.debug('The next_segment_addend is ' + str(next_segment_addend))
+                break
+        else:
+            return examined, False
+
+        drag_count = 0
+        while True:
+            crossings = self.crossings_with_segment(adjacent_segment)
+            examined.extend(crossings)
+            # Does adjacent_segment belong to a free crossing (deadend)?
+            free_crossings_at_segment = [crossing for crossing in crossings if crossing.bridge is None]
+            drag_count += 1
+            if free_crossings_at_segment:
+                free_crossing = free_crossings_at_segment[0]
+                index = free_crossing.pd_code.index(adjacent_segment)
+                if (index%2 == 1):
+                    # The crossing is oriented such that we can drag it.
+                    logging.debug('Crossing ' + str(free_crossing.pd_code) + ' can be dragged along ' + str(adjacent_segment))
+                    return examined, (free_crossing, index, drag_count)
+                logging.debug('We have completed our search of this stem')
+                return examined, False
+            # Consider the next crossing along the T stem.
+            adjacent_segment = next_adjacent_segment(adjacent_segment, next_segment_addend, max_pd_code_value)
+            logging.debug('We need to consider the next crossing along the T stem containing ' + str(adjacent_segment))
+
+    def free_crossings_with_segment(self, segment):
+        """
+        Return the free crossings containing a segment in the order of self.crossings.
+
+        Arguments:
+        segment -- (int) The PD code value of the segment
+        """
+        return [crossing for crossing in self.crossings_with_segment(segment) if crossing.bridge is None]
+
+    @property
+    def free_crossings(self):
+        """
+        The crossings that do not belong to a bridge in the order of self.crossings.
+
+        Like bridge_crossings, this scans every crossing.
+        """
+        return [crossing for crossing in self.crossings if crossing.bridge is None]
+
+    def has_free_crossings(self):
+        """
+        Determine if any crossing does not belong to a bridge.
+        """
+        return self.free_count > 0
+
     def has_rm1(self):
         """
         Inspect a knot for crossings that can be eliminated
         by Reidemeister moves of type 1.
         """
-        twisted_crossings = []
-        for index, crossing in enumerate(self.crossings):
-            if crossing.has_duplicate_value():
-                twisted_crossings.append(index)
-                logging.debug('The knot can be simplified by RM1 at crossing ' + str(crossing.pd_code))
-                return twisted_crossings
-        return False
+        self.check_rm_worklist()
+        if not self.twisted_crossings:
+            return False
+        positions = self.crossing_positions
+        if positions is None:
+            positions = self.index_crossings()
+        index = min(positions[id(crossing)] for crossing in self.twisted_crossings)
+        logging.debug('The knot can be simplified by RM1 at crossing ' + str(self.crossings[index].pd_code))
+        return [index]
 
     def has_rm2(self):
         """
@@ -474,57 +779,122 @@ class Knot:
                     break
             return output
 
+        # Only crossings whose segments match those of the next crossing
+        # can start a move, so skip all others.
+        self.check_rm_worklist()
         num_crossings = len(self.crossings)
         has_rm2 = False
-        for index, current_crossing in enumerate(self.crossings):
+        positions = self.crossing_positions
+        if positions is None:
+            positions = self.index_crossings()
+        for index in sorted(positions[id(crossing)] for crossing in self.rm2_candidates):
+            current_crossing = self.crossings[index]
             if has_rm2 == False:
                 next_index = (index+1)%num_crossings
                 next_crossing = self.crossings[next_index]
                 difference = max(current_crossing.pd_code[0], next_crossing.pd_code[0]) - min(current_crossing.pd_code[0], next_crossing.pd_code[0])
                 if (difference == 1):
-                    indices_to_compare = [[[2,3],[0,3]],[[1,2],[1,0]]]
+                    indices_to_compare = RM2_INDICES_TO_COMPARE[0]
                     has_rm2 = compare_pd_codes_for_rm2(indices_to_compare, current_crossing, next_crossing)
                 elif (difference == num_crossings-1):
-                    indices_to_compare = [[[0,3],[2,3]],[[0,1],[2,1]]]
+                    indices_to_compare = RM2_INDICES_TO_COMPARE[1]
                     has_rm2 = compare_pd_codes_for_rm2(indices_to_compare, current_crossing, next_crossing)
             else:
                 break
         return has_rm2
 
-    def list_bridge_ts(self, directory, depth):
+    def index_crossings(self):
+        """
+        Map the id of each crossing to its index in self.crossings, for
+        crossing_index.
+        """
+        self.crossing_positions = positions = dict(itertools.izip(itertools.imap(id, self.crossings), itertools.count()))
+        return positions
+
+    def index_segments(self):
+        """
+        Map each segment to the crossings containing it, in the order of
+        self.crossings, for crossings_with_segment.
+        """
+        self.segment_index = index = {}
+        for crossing in self.crossings:
+            for x in crossing.pd_code:
+                crossings = index.get(x)
+                if crossings is None:
+                    index[x] = [crossing]
+                elif crossings[-1] is not crossing:
+                    crossings.append(crossing)
+        return index
+
+    def iter_bridge_ts(self, depth = 0, symmetries = None):
         """
-        Generate a list of bridge choices that form a "T".
+        Generate the states of bridge_ts one at a time, so that a depth first
+        search only keeps the unexplored children of the states on its path
+        as knots rather than as lists of states.
+
+        The knot must not change while the states are generated.
 
         Arguments:
-        directory -- (str) The base path to store all the output files.
-        depth -- (int) The depth of the tree
+        depth -- (int) The depth of the tree, used to name the roots of new trees
+        symmetries -- (list) Automorphisms of the knot from Knot.symmetries
         """
         if self.bridges == {}:
             i = 1
             depth_suffix = '_' + str(depth)
+            equivalent_pairs = set()
             for a, b in itertools.combinations(self.free_crossings, 2):
                 if list(set(a.pd_code).intersection(b.pd_code)):
                     name = self.name + '_tree_' + str(i) + depth_suffix
+                    i += 1
+                    if symmetries:
+                        pair = (self.crossings.index(a), self.crossings.index(b))
+                        if frozenset(pair) in equivalent_pairs:
+                            logging.debug('Skipping ' + name + ' because it is symmetric to an earlier tree')
+                            continue
+                        equivalent_pairs.update(frozenset([symmetry[pair[0]], symmetry[pair[1]]]) for symmetry in symmetries)
                     e,f,g,h = a.pd_code
                     p,q,r,s = b.pd_code
                     bridges = {0:[f,h],1:[q,s]}
                     logging.debug('We found ' + name + ' at ' + str(a.pd_code) + ', ' + str(b.pd_code))
-                    # Create the directory for this tree.
-                    tree_directory = directory + '/tree_' + str(i)
-                    if not os.path.exists(tree_directory):
-                        os.makedirs(tree_directory)
-                    # Create the file to store the tree root.
-                    tree_file = tree_directory + '/tree_' + str(i) + depth_suffix + '.csv'
-                    outfile = open(tree_file, "w")
+                    yield (name, self.pd_code(), bridges)
+        else:
+            i = 1
+            for a, b in itertools.product(self.bridge_crossings(), self.free_crossings):
+                if list(set(a.pd_code).intersection(b.pd_code)):
+                    # Designate b on this knot, record the child and undo the
+                    # designation. Deleting the new bridge frees exactly the
+                    # crossings it covered, so no copy of the knot is needed.
+                    key = self.designate_bridge(b)
+                    knot_name_parts = self.name.rsplit('_', 1)
+                    child = (knot_name_parts[0] + '_' + str(i), self.pd_code(), copy_bridges(self.bridges))
+                    self.delete_bridge(key)
+                    i += 1
+                    yield child
+
+    def list_bridge_ts(self, directory, depth):
+        """
+        Write the bridge choices that form a "T" to CSV files.
+
+        Arguments:
+        directory -- (str) The base path to store all the output files.
+        depth -- (int) The depth of the tree
+        """
+        depth_suffix = '_' + str(depth)
+        if self.bridges == {}:
+            for i, (name, pd_code, bridges) in enumerate(self.bridge_ts(depth), 1):
+                # Create the directory for this tree.
+                tree_directory = directory + '/tree_' + str(i)
+                if not os.path.exists(tree_directory):
+                    os.makedirs(tree_directory)
+                # Create the file to store the tree root.
+                tree_file = tree_directory + '/tree_' + str(i) + depth_suffix + '.csv'
+                with open(tree_file, "w") as outfile:
                     outputwriter = csv.writer(outfile, delimiter=',')
                     outputwriter.writerow(['name','pd_notation','bridges'])
-                    outputwriter.writerow([name,str(self),bridges])
-                    i += 1
-            outfile.close()
+                    outputwriter.writerow([name,str(pd_code),bridges])
         else:
             # Check if a file for this knot & depth exists. If not, create the file.
             tree_prefix = directory.rsplit('/', 1)[1]
-            depth_suffix = '_' + str(depth)
             file_name = tree_prefix + depth_suffix + '.csv'
             file_path = directory + '/' + file_name
             if not os.path.isfile(file_path):
@@ -532,18 +902,21 @@ class Knot:
                 with open(file_path, "w") as outfile:
                     outputwriter = csv.writer(outfile, delimiter=',')
                     outputwriter.writerow(['name','pd_notation','bridges'])
-            # Find and store bridge Ts.
-            i = 1
-            for a, b in itertools.product(self.bridge_crossings(), self.free_crossings):
-                knot_copy = copy.deepcopy(self)
-                if list(set(a.pd_code).intersection(b.pd_code)):
-                    knot_copy.designate_bridge(b)
-                    knot_name_parts = self.name.rsplit('_', 1)
-                    knot_copy_name = knot_name_parts[0] + '_' + str(i)
-                    with open(file_path, "a") as outfile:
-                        outputwriter = csv.writer(outfile, delimiter=',')
-                        outputwriter.writerow([knot_copy_name,str(knot_copy),str(knot_copy.bridges)])
-                    i += 1
+            # Store bridge Ts.
+            with open(file_path, "a") as outfile:
+                outputwriter = csv.writer(outfile, delimiter=',')
+                for name, pd_code, bridges in self.bridge_ts(depth):
+                    outputwriter.writerow([name,str(pd_code),str(bridges)])
+
+    def make_crossing(self, pd_code, bridge = None):
+        """
+        Return a new Crossing to add to this knot.
+
+        Arguments:
+        pd_code -- (list) the PD notation of the crossing
+        bridge -- (int) the key of the bridge the crossing belongs to or None
+        """
+        return Crossing(pd_code, bridge)
 
     def max_pd_code_value(self):
         """
@@ -569,6 +942,41 @@ class Knot:
         """
         return len(self.crossings)
 
+    def pd_code(self):
+        """
+        Return a copy of the PD code of the knot as a list of lists.
+        """
+        return [list(crossing.pd_code) for crossing in self.crossings]
+
+    def symmetries(self):
+        """
+        Return the automorphisms of the diagram.
+
+        Only relabelings which shift the segment labels cyclically, possibly
+        after reversing the orientation of the knot, are considered. Each
+        automorphism is a list sending the index of a crossing to the index
+        of its image, and the identity is always included.
+        """
+        max_value = self.max_pd_code_value()
+        index_of = dict((tuple(crossing.pd_code), index) for index, crossing in enumerate(self.crossings))
+        symmetries = []
+        for shift in range(max_value):
+            for reverse in [False, True]:
+                symmetry = []
+                for crossing in self.crossings:
+                    if reverse:
+                        # Reversing the orientation makes c the incoming undercrossing.
+                        a, b, c, d = [(shift - x)%max_value + 1 for x in crossing.pd_code]
+                        image = (c, d, a, b)
+                    else:
+                        image = tuple((x - 1 + shift)%max_value + 1 for x in crossing.pd_code)
+                    if image not in index_of:
+                        break
+                    symmetry.append(index_of[image])
+                else:
+                    symmetries.append(symmetry)
+        return symmetries
+
     def simplify_bridges(self, key):
         """
         Delete or merge bridges eliminated as part of Reidemeister moves.
@@ -622,13 +1030,11 @@ class Knot:
             if duplicate_value == original_max_value:
                 extend_if_bridge_end = [1, duplicate_value + 1]
                 # Adjust crossings.
-                for crossing in self.crossings:
-                    crossing.alter_elements_greater_than(new_max_value, -new_max_value, new_max_value)
+                self.alter_crossings_greater_than(new_max_value, -new_max_value, new_max_value)
             else:
                 extend_if_bridge_end = [duplicate_value - 1, duplicate_value + 1]
                 # Adjust crossings.
-                for crossing in self.crossings:
-                    crossing.alter_elements_greater_than(duplicate_value, -2, new_max_value)
+                self.alter_crossings_greater_than(duplicate_value, -2, new_max_value)
             for i, bridge in self.bridges.iteritems():
                 # Adjust bridges.
                 self.bridges[i] = map(alter_bridge_end_for_rm1, bridge, repeat(duplicate_value, 2), repeat(new_max_value, 2))
@@ -673,8 +1079,7 @@ class Knot:
             value, addend = segment
 
             # Alter values of each crossing.
-            for crossing in self.crossings:
-                crossing.alter_elements_greater_than(value, addend)
+            self.alter_crossings_greater_than(value, addend)
 
             # Adjust bridges.
             for key, bridge in self.bridges.iteritems():
@@ -687,8 +1092,7 @@ class Knot:
             del(segments_to_eliminate[-1])
 
         # Mod final crossings based on maximum value allowed.
-        for crossing in self.crossings:
-            crossing.alter_elements_greater_than(maximum, 0, maximum)
+        self.alter_crossings_greater_than(maximum, 0, maximum)
         # Mod final bridge ends based on maximum value allowed.
         self.alter_bridge_segments_greater_than(maximum, 0, maximum)
                 
@@ -729,6 +1133,20 @@ class Knot:
                 break;
         return self
 
+    def update_t_stems(self):
+        """
+        Forget what find_crossing_to_drag found for the bridge ends that
+        examined a crossing touched since it last ran.
+        """
+        t_stem_keys = self.t_stem_keys
+        for crossing in self.stem_worklist:
+            for key in t_stem_keys.pop(id(crossing), ()):
+                self.t_stems.pop(key, None)
+        self.stem_worklist = []
+        if not self.t_stems:
+            t_stem_keys.clear()
+        return self
+
 def alter_element_for_drag(x, first, second):
     """
     A helper function for the drag the underpass move to adjust PD code values
@@ -786,6 +1204,34 @@ def alter_y_values(y, addends, maximum):
     y_vals = [alter_if_greater(y+addend, maximum, 0, maximum) for addend in addends]
     return y_vals
 
+def canonical_state(pd_code, bridges):
+    """
+    Return a hashable encoding of a PD code and its bridges which is the same
+    for every cyclic relabeling of the segments and every numbering of the bridges.
+
+    Arguments:
+    pd_code -- (list) the PD notation of a knot expressed as a list of lists
+    bridges -- (dict) Each value is a list of PD code values for the ends of a bridge
+    """
+    max_value = len(pd_code)*2
+    canonical = None
+    for shift in range(max_value):
+        # Relabel segment x as x+shift, wrapping around to 1 after max_value.
+        crossings = tuple(sorted(tuple((x - 1 + shift)%max_value + 1 for x in crossing) for crossing in pd_code))
+        ends = tuple(sorted(tuple(sorted((x - 1 + shift)%max_value + 1 for x in bridge)) for bridge in bridges.itervalues()))
+        if (canonical is None) or ((crossings, ends) < canonical):
+            canonical = (crossings, ends)
+    return canonical
+
+def copy_bridges(bridges):
+    """
+    Return a copy of a dictionary of bridges.
+
+    Arguments:
+    bridges -- (dict) Each value is a list of PD code values for the ends of a bridge
+    """
+    return dict((key, list(ends)) for key, ends in bridges.iteritems())
+
 def create_knot_from_pd_code(pd_code, name = None, bridges = None):
     """
     Create a Knot object using a provided PD code.
@@ -808,6 +1254,24 @@ def diff(first, second):
     second = set(second)
     return [item for item in first if item not in second]
 
+def drag_contact(b, d, e, g):
+    """
+    Return the key of DRAG_CASES for the way the crossing to drag meets
+    the bridge crossing, or None if they do not meet.
+
+    Arguments:
+    b, d -- (int) The overpass segments of the crossing to drag, (a,b,c,d).
+    e, g -- (int) The underpass segments of the bridge crossing, (e,f,g,h).
+    """
+    if d == e:
+        return 'd=e'
+    elif b == e:
+        return 'b=e'
+    elif d == g:
+        return 'd=g'
+    elif b == g:
+        return 'b=g'
+
 def get_y_addends(a, h, y):
     """
     Get the addends for y to alter the bridge tuple for a drag.
@@ -824,6 +1288,42 @@ def get_y_addends(a, h, y):
     addends.sort(reverse = bool(y == h))
     return addends
 
+def has_rm2_pattern(current_crossing, next_crossing):
+    """
+    Determine if two crossings share segments in a way that allows an RM2
+    move, ignoring whether their first values are consecutive.
+
+    Arguments:
+    current_crossing -- (obj) A Crossing
+    next_crossing -- (obj) The Crossing after it in the knot
+    """
+    current = current_crossing.pd_code
+    following = next_crossing.pd_code
+    for indices_to_compare in RM2_INDICES_TO_COMPARE:
+        for comparison in indices_to_compare:
+            if [current[comparison[0][0]], current[comparison[0][1]]] == [following[comparison[1][0]], following[comparison[1][1]]]:
+                return True
+    return False
+
+def label_before_drags(thresholds, label):
+    """
+    Return the largest label from before a series of drags which is at
+    most label after them.
+
+    Arguments:
+    thresholds -- (list) The sorted labels from before the drags after which
+                  segments were inserted, as in Knot.drag_thresholds.
+    label -- (int) A label after the drags
+    """
+    low, high = label - 2*len(thresholds), label
+    while low < high:
+        middle = (low + high + 1)//2
+        if middle + 2*bisect.bisect_left(thresholds, middle) <= label:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
 def next_adjacent_segment(current_segment, next_segment_addend, max_pd_code_value):
     """
     Given a direction of travel, return the PD code segment of the section adjacent to current_segment.
@@ -837,3 +1337,21 @@ def next_adjacent_segment(current_segment, next_segment_addend, max_pd_code_valu
     if next_segment == 0:
         next_segment = max_pd_code_value
     return next_segment
+
+def update_membership(crossings, crossing, member):
+    """
+    Add a crossing object to a list or remove it, comparing by identity.
+
+    Arguments:
+    crossings -- (list) The list to update
+    crossing -- (obj) The Crossing to add or remove
+    member -- (bool) Whether the crossing should be in the list
+    """
+    for index, other in enumerate(crossings):
+        if other is crossing:
+            if not member:
+                del crossings[index]
+            return crossings
+    if member:
+        crossings.append(crossing)
+    return crossings
@@ -0,0 +1,49 @@
+#!/usr/bin/env python2.7
+
+import unittest
+from array_knot import *
+from bridge_search import *
+
+logging.basicConfig(filename='tests.log', filemode='w', format='%(asctime)s: %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p', level=logging.DEBUG)
+
+class AlterArrayIfGreaterTestCase(unittest.TestCase):
+    def testPositiveAddend(self):
+        pd = alter_array_if_greater(numpy.array([[1,2,3,4]]), 2, 1, 3)
+        self.assertEqual(pd.tolist(), [[1,2,1,2]])
+
+    def testNegativeAddend(self):
+        pd = alter_array_if_greater(numpy.array([[1,2,3,4]]), 2, -2)
+        self.assertEqual(pd.tolist(), [[1,2,1,2]])
+
+class ArrayKnotTestCase(unittest.TestCase):
+    def testDragCrossingUnderBridge(self):
+        pd_code = [[1,5,2,4],[3,11,4,10],[5,8,6,9],[7,12,8,1],[9,3,10,2],[11,6,12,7]]
+        knot = create_knot_from_pd_code(pd_code, bridges = {0:[5,4],1:[8,9]})
+        knot.drag_crossing_under_bridge(knot.crossings[5], 6)
+        array_knot = create_array_knot_from_pd_code(pd_code, bridges = {0:[5,4],1:[8,9]})
+        array_knot.drag_crossing_under_bridge(array_knot.crossings[5], 6)
+        self.assertEqual(array_knot, knot)
+        self.assertEqual(array_knot.bridges, knot.bridges)
+
+    def testSimplifyRm1Rm2Recursively(self):
+        array_knot = create_array_knot_from_pd_code([[1,7,2,6],[2,5,3,6],[4,3,5,4],[7,1,8,8]])
+        array_knot.simplify_rm1_rm2_recursively()
+        self.assertEqual(array_knot, Knot([]))
+
+    def testSimplifyRm2(self):
+        pd_code = [[2,12,3,11],[3,10,4,11],[4,5,5,6],[6,1,7,2],[7,1,8,14],[8,13,9,14],[9,13,10,12]]
+        array_knot = create_array_knot_from_pd_code(pd_code)
+        array_knot.simplify_rm2([3,4], [[7, -2],[1, -1]])
+        answer = create_knot_from_pd_code([[1,9,2,8],[2,7,3,8],[3,4,4,5],[5,10,6,1],[6,10,7,9]])
+        self.assertEqual(array_knot, answer)
+
+    def testSearch(self):
+        pd_code = [[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]]
+        knot = create_knot_from_pd_code(pd_code, '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        results = BridgeSearch(knot).run()
+        array_results = BridgeSearch(knot, backend = 'array').run()
+        self.assertEqual(array_results, results)
+
+if __name__ == '__main__':
+    unittest.main()
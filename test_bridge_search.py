@@ -0,0 +1,127 @@
+#!/usr/bin/env python2.7
+
+import os
+import unittest
+from bridge_search import *
+
+logging.basicConfig(filename='tests.log', filemode='w', format='%(asctime)s: %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p', level=logging.DEBUG)
+
+class FailingBridgeSearch(BridgeSearch):
+    """
+    A BridgeSearch whose workers fail at the first state below the roots,
+    by raising an exception or by exiting.
+    """
+    def __init__(self, knot, exit_code = None, **kwargs):
+        BridgeSearch.__init__(self, knot, **kwargs)
+        self.exit_code = exit_code
+
+    def expand(self, state, depth):
+        if depth > 0:
+            if self.exit_code is not None:
+                os._exit(self.exit_code)
+            raise ValueError('Failed at depth ' + str(depth))
+        return BridgeSearch.expand(self, state, depth)
+
+class BridgeSearchTestCase(unittest.TestCase):
+    def testTrefoil(self):
+        knot = create_knot_from_pd_code([[1,5,2,4],[3,1,4,6],[5,3,6,2]], '3_1')
+        results = BridgeSearch(knot).run()
+        self.assertEqual(sorted(results), [('3_1_tree_1_0', 2), ('3_1_tree_2_0', 2), ('3_1_tree_3_0', 2)])
+
+    def testWriteLeaf(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        leaves = []
+        results = BridgeSearch(knot, leaves.append).run()
+        self.assertEqual([(leaf.name, len(leaf.bridges)) for leaf in leaves], results)
+        self.assertEqual(sorted(result[1] for result in results), [2]*7 + [3]*11)
+
+    def testDepthFirst(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        breadth_first = BridgeSearch(knot).run()
+        depth_first = BridgeSearch(knot, depth_first = True).run()
+        self.assertEqual(sorted(depth_first), sorted(breadth_first))
+
+    def testDepthFirstTarget(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        search = BridgeSearch(knot, target = 2, depth_first = True)
+        self.assertEqual(search.run(), [('6_2_tree_1_0', 2)])
+
+    def testPrune(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        search = BridgeSearch(knot, prune = True)
+        results = search.run()
+        self.assertEqual(min(result[1] for result in results), 2)
+        self.assertEqual(search.best, 2)
+        self.assertTrue(search.pruned > 0)
+        self.assertTrue(len(results) < 18)
+        # The leaf found by the greedy descent is recorded exactly once.
+        self.assertEqual(len(set(results)), len(results))
+
+    def testPruneWorkStealing(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        results = BridgeSearch(knot, prune = True, jobs = 3).run()
+        self.assertEqual(min(result[1] for result in results), 2)
+        # Each worker starts with a copy of the leaf of the greedy descent.
+        self.assertEqual(len(set(results)), len(results))
+
+    def testPruneKeepsVanishingBridges(self):
+        knot = create_knot_from_pd_code([[1,10,2,11],[3,7,4,6],[5,17,6,16],[7,14,8,15],[8,18,9,17],[9,2,10,3],[11,18,12,19],[13,20,14,1],[15,5,16,4],[19,12,20,13]], 'the_culprit')
+        knot.simplify_rm1_rm2_recursively()
+        results = BridgeSearch(knot, prune = True).run()
+        self.assertEqual(min(result[1] for result in results), 0)
+
+    def testTarget(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        search = BridgeSearch(knot, target = 2)
+        self.assertEqual(search.run(), [('6_2_tree_1_0', 2)])
+        self.assertTrue(search.is_finished())
+
+    def testTargetNotReached(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        search = BridgeSearch(knot, target = 1)
+        self.assertEqual(len(search.run()), 18)
+        self.assertFalse(search.is_finished())
+
+    def testTranspositions(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        search = BridgeSearch(knot, transpositions = 1000)
+        results = search.run()
+        self.assertTrue(search.transposition_hits > 0)
+        self.assertTrue(len(results) < 18)
+        self.assertEqual(min(result[1] for result in results), 2)
+
+    def testTranspositionTableIsBounded(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        search = BridgeSearch(knot, transpositions = 3)
+        search.run()
+        self.assertEqual(len(search.transposition_table), 3)
+
+    def testSymmetry(self):
+        knot = create_knot_from_pd_code([[2,8,3,7],[4,10,5,9],[6,2,7,1],[8,4,9,3],[10,6,1,5]], '5_1')
+        results = BridgeSearch(knot, symmetry = True).run()
+        self.assertEqual(results, [('5_1_tree_1_0', 2)])
+
+    def testWorkStealing(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        serial = BridgeSearch(knot).run()
+        parallel = BridgeSearch(knot, jobs = 3).run()
+        self.assertEqual(sorted(parallel), sorted(serial))
+
+    def testWorkStealingFailure(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        self.assertRaises(RuntimeError, FailingBridgeSearch(knot, jobs = 3).run)
+        self.assertRaises(RuntimeError, FailingBridgeSearch(knot, exit_code = 1, jobs = 3).run)
+
+if __name__ == '__main__':
+    unittest.main()
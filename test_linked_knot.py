@@ -0,0 +1,62 @@
+#!/usr/bin/env python2.7
+
+import unittest
+from linked_knot import *
+from bridge_search import *
+
+logging.basicConfig(filename='tests.log', filemode='w', format='%(asctime)s: %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p', level=logging.DEBUG)
+
+class LinkedKnotTestCase(unittest.TestCase):
+    def testAlterCrossingsForDrag(self):
+        linked_knot = create_linked_knot_from_pd_code([[1,5,2,4],[3,1,4,6],[5,3,6,2]])
+        linked_knot.alter_crossings_for_drag([2, 4], [])
+        self.assertEqual(linked_knot.pd_code(), [[1,9,2,6],[5,1,6,10],[9,5,10,2]])
+
+    def testAlterCrossingsGreaterThan(self):
+        linked_knot = create_linked_knot_from_pd_code([[1,5,2,4],[3,1,4,6],[5,3,6,2]])
+        linked_knot.alter_crossings_greater_than(4, -2, 4)
+        self.assertEqual(linked_knot.pd_code(), [[1,3,2,4],[3,1,4,4],[3,3,4,2]])
+
+    def testAlterCrossingsGreaterThanTwice(self):
+        pd_code = [[1,9,2,8],[3,7,4,6],[5,12,6,13],[7,3,8,2],[9,1,10,16],[11,15,12,14],[13,4,14,5],[15,11,16,10]]
+        knot = create_knot_from_pd_code(pd_code)
+        linked_knot = create_linked_knot_from_pd_code(pd_code)
+        for value, addend, maximum in [(10, -2, 14), (8, -2, 12)]:
+            knot.alter_crossings_greater_than(value, addend, maximum)
+            linked_knot.alter_crossings_greater_than(value, addend, maximum)
+            self.assertEqual(linked_knot.pd_code(), knot.pd_code())
+        # Reading the labels replaced the merged segments of the crossings.
+        segments = set(linked_knot.segments)
+        self.assertTrue(all(segments.issuperset(crossing.segments) for crossing in linked_knot.crossings))
+
+    def testDragCrossingUnderBridge(self):
+        pd_code = [[1,5,2,4],[3,11,4,10],[5,8,6,9],[7,12,8,1],[9,3,10,2],[11,6,12,7]]
+        knot = create_knot_from_pd_code(pd_code, bridges = {0:[5,4],1:[8,9]})
+        knot.drag_crossing_under_bridge(knot.crossings[5], 6)
+        linked_knot = create_linked_knot_from_pd_code(pd_code, bridges = {0:[5,4],1:[8,9]})
+        linked_knot.drag_crossing_under_bridge(linked_knot.crossings[5], 6)
+        self.assertEqual(linked_knot, knot)
+        self.assertEqual(linked_knot.bridges, knot.bridges)
+
+    def testSimplifyRm1Rm2Recursively(self):
+        linked_knot = create_linked_knot_from_pd_code([[1,7,2,6],[2,5,3,6],[4,3,5,4],[7,1,8,8]])
+        linked_knot.simplify_rm1_rm2_recursively()
+        self.assertEqual(linked_knot, Knot([]))
+
+    def testSimplifyRm2(self):
+        pd_code = [[2,12,3,11],[3,10,4,11],[4,5,5,6],[6,1,7,2],[7,1,8,14],[8,13,9,14],[9,13,10,12]]
+        linked_knot = create_linked_knot_from_pd_code(pd_code)
+        linked_knot.simplify_rm2([3,4], [[7, -2],[1, -1]])
+        answer = create_knot_from_pd_code([[1,9,2,8],[2,7,3,8],[3,4,4,5],[5,10,6,1],[6,10,7,9]])
+        self.assertEqual(linked_knot, answer)
+
+    def testSearch(self):
+        pd_code = [[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]]
+        knot = create_knot_from_pd_code(pd_code, '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        results = BridgeSearch(knot).run()
+        linked_results = BridgeSearch(knot, backend = 'linked').run()
+        self.assertEqual(linked_results, results)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -62,6 +62,14 @@ class HasRm1TestCase(unittest.TestCase):
         knot = create_knot_from_pd_code([[1,5,2,4],[3,1,4,6],[5,3,6,2]])
         self.assertEqual(knot.has_rm1(), False)
 
+    def testHasRm1AfterSimplifying(self):
+        # Removing the twist at [3,3,4,2] creates a twist at the first crossing.
+        knot = create_knot_from_pd_code([[1,5,2,4],[3,3,4,2],[7,10,8,1],[8,6,9,5],[9,6,10,7]])
+        self.assertEqual(knot.has_rm1(), [1])
+        knot.simplify_rm1([1])
+        self.assertEqual(knot.has_rm1(), create_knot_from_pd_code(knot.pd_code()).has_rm1())
+        self.assertEqual(knot.has_rm1(), [0])
+
 class HasRm2TestCase(unittest.TestCase):
     def testHasRm2(self):
         # The first and last tuple form an arc of type 2.
@@ -84,6 +92,63 @@ class HasRm2TestCase(unittest.TestCase):
         knot = create_knot_from_pd_code([[1,4,2,5],[2,6,3,5],[3,6,4,1]], 'two arcs')
         self.assertEqual(knot.has_rm2(), ([0,1], [[2,-2], [5,-2]]))
 
+    def testHasRm2AfterSimplifying(self):
+        # Removing a twist relabels the arc formed by the first two crossings.
+        knot = create_knot_from_pd_code([[1,7,2,6],[2,5,3,6],[4,3,5,4],[7,1,8,8]])
+        self.assertEqual(knot.has_rm2(), ([0,1], [[2, -2], [6, -2]]))
+        knot.simplify_rm1(knot.has_rm1())
+        self.assertEqual(knot.has_rm2(), create_knot_from_pd_code(knot.pd_code()).has_rm2())
+        self.assertEqual(knot.has_rm2(), ([0,1], [[2, -2], [4, -2]]))
+
+class CanonicalKeyTestCase(unittest.TestCase):
+    def testCyclicRelabeling(self):
+        knot = create_knot_from_pd_code([[1,5,2,4],[3,1,4,6],[5,3,6,2]], bridges = {0:[5,4]})
+        # Every label moved up by one, with 6 wrapping around to 1.
+        shifted = create_knot_from_pd_code([[2,6,3,5],[4,2,5,1],[6,4,1,3]], bridges = {0:[6,5]})
+        self.assertEqual(knot.canonical_key(), shifted.canonical_key())
+
+    def testBridgeNumbering(self):
+        pd_code = [[1,9,2,8],[3,7,4,6],[5,12,6,13],[7,3,8,2],[9,1,10,16],[11,15,12,14],[13,4,14,5],[15,11,16,10]]
+        self.assertEqual(canonical_state(pd_code, {0:[9,8],1:[7,6]}), canonical_state(pd_code, {3:[6,7],5:[8,9]}))
+
+    def testDifferentBridges(self):
+        pd_code = [[1,9,2,8],[3,7,4,6],[5,12,6,13],[7,3,8,2],[9,1,10,16],[11,15,12,14],[13,4,14,5],[15,11,16,10]]
+        self.assertNotEqual(canonical_state(pd_code, {0:[9,8]}), canonical_state(pd_code, {0:[7,6]}))
+
+class CrossingIndexTestCase(unittest.TestCase):
+    def testAfterDragging(self):
+        knot = create_knot_from_pd_code([[1,5,2,4],[3,11,4,10],[5,8,6,9],[7,12,8,1],[9,3,10,2],[11,6,12,7]], bridges = {0:[5,4],1:[8,9]})
+        knot.crossing_index(knot.crossings[0])
+        knot.drag_crossing_under_bridge(knot.crossings[5], 6)
+        self.assertEqual([knot.crossing_index(crossing) for crossing in knot.crossings], range(len(knot.crossings)))
+
+    def testAfterDeleting(self):
+        knot = create_knot_from_pd_code([[1,5,2,4],[3,6,4,7],[5,1,6,8],[7,2,8,3]])
+        deleted = knot.crossings[1]
+        knot.crossing_index(deleted)
+        knot.delete_crossings([1])
+        self.assertEqual(knot.crossing_index(deleted), None)
+        self.assertEqual([knot.crossing_index(crossing) for crossing in knot.crossings], [0,1,2])
+
+class CrossingsWithSegmentTestCase(unittest.TestCase):
+    def testCrossingsWithSegment(self):
+        knot = create_knot_from_pd_code([[1,5,2,4],[3,1,4,6],[5,3,6,2]])
+        self.assertEqual([crossing.pd_code for crossing in knot.crossings_with_segment(4)], [[1,5,2,4],[3,1,4,6]])
+
+    def testTwistedCrossing(self):
+        knot = create_knot_from_pd_code([[1,5,2,4],[3,3,4,2],[6,6,7,5],[8,8,1,7]])
+        self.assertEqual([crossing.pd_code for crossing in knot.crossings_with_segment(3)], [[3,3,4,2]])
+
+    def testAfterSimplifying(self):
+        knot = create_knot_from_pd_code([[1,5,2,4],[3,3,4,2],[6,6,7,5],[8,8,1,7]])
+        knot.crossings_with_segment(1)
+        knot.simplify_rm1([1])
+        self.assertEqual([crossing.pd_code for crossing in knot.crossings_with_segment(2)], [[1,3,2,2]])
+
+    def testFreeCrossingsWithSegment(self):
+        knot = create_knot_from_pd_code([[1,5,2,4],[3,1,4,6],[5,3,6,2]], bridges = {0:[5,4]})
+        self.assertEqual([crossing.pd_code for crossing in knot.free_crossings_with_segment(4)], [[3,1,4,6]])
+
 class DeleteCrossingsTestCase(unittest.TestCase):
     def testDeleteCrossings(self):
         knot = create_knot_from_pd_code([[1,5,2,4],[3,6,4,7],[5,1,6,8],[7,2,8,3]])
@@ -91,6 +156,44 @@ class DeleteCrossingsTestCase(unittest.TestCase):
         answer = create_knot_from_pd_code([[1,5,2,4]])
         self.assertEqual(knot, answer)
 
+    def testFreeCrossingOrder(self):
+        knot = create_knot_from_pd_code([[1,15,2,14],[5,17,6,16],[6,12,7,11],[9,5,10,4],[10,16,11,15],[12,8,13,7],[13,3,14,2],[17,9,18,8],[18,4,1,3]])
+        knot.designate_bridge(knot.crossings[0])
+        knot.delete_crossings([3,6])
+        self.assertEqual([crossing.pd_code for crossing in knot.free_crossings], [[6,12,7,11],[12,8,13,7],[17,9,18,8],[18,4,1,3]])
+        self.assertEqual([crossing.pd_code for crossing in knot.bridge_crossings()], [[1,15,2,14],[5,17,6,16],[10,16,11,15]])
+
+class DeleteBridgeTestCase(unittest.TestCase):
+    def testDeleteBridge(self):
+        knot = create_knot_from_pd_code([[1,5,2,4],[3,1,4,6],[5,3,6,2]], bridges = {0:[5,4]})
+        knot.delete_bridge(0)
+        self.assertEqual(knot.bridges, {})
+        self.assertEqual(knot.free_crossings, knot.crossings)
+        self.assertTrue(knot.has_free_crossings())
+
+class BridgeMembersTestCase(unittest.TestCase):
+    def assertMembersMatch(self, knot):
+        self.assertEqual(knot.free_count, len(knot.free_crossings))
+        members = dict((key, sorted(crossing.pd_code for crossing in crossings)) for key, crossings in knot.bridge_members.iteritems() if crossings)
+        answer = {}
+        for crossing in knot.bridge_crossings():
+            answer.setdefault(crossing.bridge, []).append(crossing.pd_code)
+        self.assertEqual(members, dict((key, sorted(crossings)) for key, crossings in answer.iteritems()))
+
+    def testAfterDragging(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        for name, pd_code, bridges in knot.bridge_ts(0):
+            child = create_knot_from_pd_code(pd_code, name, bridges)
+            self.assertMembersMatch(child)
+            child.drag_and_simplify_recursively()
+            self.assertMembersMatch(child)
+
+    def testAfterDeletingBridge(self):
+        knot = create_knot_from_pd_code([[1,9,2,8],[3,7,4,6],[5,12,6,13],[7,3,8,2],[9,1,10,16],[11,15,12,14],[13,4,14,5],[15,11,16,10]], '8_1_tree_1_0', {0:[9,8],1:[7,6]})
+        knot.delete_bridge(1)
+        self.assertMembersMatch(knot)
+
 class DesignateBridgeTestCase(unittest.TestCase):
     def testDesignateBridge(self):
         knot = create_knot_from_pd_code([[1,15,2,14],[5,17,6,16],[6,12,7,11],[9,5,10,4],[10,16,11,15],[12,8,13,7],[13,3,14,2],[17,9,18,8],[18,4,1,3]])
@@ -98,6 +201,36 @@ class DesignateBridgeTestCase(unittest.TestCase):
         answer = Knot([Crossing(x[0],x[1]) for x in [[[1, 15, 2, 14], 0],[[5, 17, 6, 16], 0],[[6, 12, 7, 11], None],[[9, 5, 10, 4], None],[[10, 16, 11, 15], 0],[[12, 8, 13, 7], None],[[13, 3, 14, 2], None],[[17, 9, 18, 8], None],[[18, 4, 1, 3], None]]])
         self.assertEqual(knot, answer)
 
+class BridgeTsTestCase(unittest.TestCase):
+    def testBridgeTsWithoutBridges(self):
+        knot = create_knot_from_pd_code([[1,5,2,4],[3,1,4,6],[5,3,6,2]], '3_1')
+        states = knot.bridge_ts(0)
+        self.assertEqual([state[0] for state in states], ['3_1_tree_1_0', '3_1_tree_2_0', '3_1_tree_3_0'])
+        self.assertEqual(states[0], ('3_1_tree_1_0', [[1,5,2,4],[3,1,4,6],[5,3,6,2]], {0:[5,4],1:[1,6]}))
+
+    def testBridgeTsWithBridges(self):
+        knot = create_knot_from_pd_code([[1,9,2,8],[3,7,4,6],[5,12,6,13],[7,3,8,2],[9,1,10,16],[11,15,12,14],[13,4,14,5],[15,11,16,10]], '8_1_tree_1_0', {0:[9,8],1:[7,6]})
+        states = knot.bridge_ts(1)
+        self.assertEqual([state[0] for state in states], ['8_1_tree_1_' + str(i) for i in range(1, len(states)+1)])
+        for name, pd_code, bridges in states:
+            self.assertEqual(pd_code, knot.pd_code())
+            self.assertEqual(len(bridges), 3)
+
+    def testBridgeTsLeavesKnotUnchanged(self):
+        knot = create_knot_from_pd_code([[1,9,2,8],[3,7,4,6],[5,12,6,13],[7,3,8,2],[9,1,10,16],[11,15,12,14],[13,4,14,5],[15,11,16,10]], '8_1_tree_1_0', {0:[9,8],1:[7,6]})
+        pd_code = knot.pd_code()
+        bridges = copy_bridges(knot.bridges)
+        free_crossings = knot.free_crossings
+        for state in knot.iter_bridge_ts(1):
+            self.assertEqual(knot.pd_code(), pd_code)
+            self.assertEqual(knot.bridges, bridges)
+            self.assertEqual(knot.free_crossings, free_crossings)
+
+    def testBridgeTsWithSymmetries(self):
+        knot = create_knot_from_pd_code([[1,5,2,4],[3,1,4,6],[5,3,6,2]], '3_1')
+        states = knot.bridge_ts(0, knot.symmetries())
+        self.assertEqual([state[0] for state in states], ['3_1_tree_1_0'])
+
 class DragCrossingUnderBridgeTestCase(unittest.TestCase):
     # Dragging case b=g, a>y, y==f
     def testDragCrossingUnderBridge(self):
@@ -218,6 +351,39 @@ class DragCrossingUnderBridgeTestCase(unittest.TestCase):
         answer = Knot([Crossing(x[0], x[1]) for x in [[[17,39,18,38],0],[[24,2,25,1],2],[[25,34,26,35],0],[[26,11,27,12],None],[[28,9,29,10],None],[[29,37,30,36],0],[[30,19,31,20],1],[[31,40,32,41],0],[[32,6,33,5],2],[[41,21,42,20],1],[[42,21,43,22],1],[[43,5,44,4],2],[[44,16,45,15],None],[[45,2,46,3],2],[[46,24,1,23],1],[[6,40,7,39],0],[[7,19,8,18],1],[[8,37,9,38],0],[[10,27,11,28],None],[[12,36,13,35],0],[[13,22,14,23],1],[[14,4,15,3],2],[[16,33,17,34],0]]])
         self.assertEqual(knot, answer)
 
+class FindCrossingToDragTestCase(unittest.TestCase):
+    def testAfterEachDrag(self):
+        knot = create_knot_from_pd_code([[1,8,2,9],[3,11,4,10],[5,1,6,12],[7,2,8,3],[9,7,10,6],[11,5,12,4]], '6_2')
+        knot.simplify_rm1_rm2_recursively()
+        for name, pd_code, bridges in knot.bridge_ts(0):
+            child = create_knot_from_pd_code(pd_code, name, bridges)
+            args = child.find_crossing_to_drag()
+            while args:
+                # Without the cache, every T stem is followed again.
+                t_stems = child.t_stems
+                child.t_stems = {}
+                self.assertEqual(child.find_crossing_to_drag(), args)
+                child.t_stems = t_stems
+                child.drag_crossing_under_bridge_resursively(*args)
+                child.simplify_rm1_rm2_recursively()
+                args = child.find_crossing_to_drag()
+
+class SymmetriesTestCase(unittest.TestCase):
+    def testTorusKnot(self):
+        # The (2,5) torus knot is symmetric under every rotation of its labels
+        # and every reversal of its orientation.
+        knot = create_knot_from_pd_code([[2,8,3,7],[4,10,5,9],[6,2,7,1],[8,4,9,3],[10,6,1,5]])
+        symmetries = knot.symmetries()
+        self.assertEqual(len(symmetries), 10)
+        self.assertTrue([0,1,2,3,4] in symmetries)
+        for symmetry in symmetries:
+            self.assertEqual(sorted(symmetry), [0,1,2,3,4])
+
+    def testFigureEight(self):
+        knot = create_knot_from_pd_code([[4,2,5,1],[8,6,1,5],[6,3,7,4],[2,7,3,8]])
+        # Shifting every label by 4 swaps the first two and the last two crossings.
+        self.assertEqual(knot.symmetries(), [[0,1,2,3],[1,0,3,2]])
+
 class SimplifyRm1TestCase(unittest.TestCase):
     def testSimplifyRm1(self):
         knot = create_knot_from_pd_code([[1,5,2,4],[3,3,4,2],[6,6,7,5],[8,8,1,7]])